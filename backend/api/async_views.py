@@ -0,0 +1,141 @@
+'''Асинхронные версии частых GET-запросов для запуска через ASGI.
+
+Работа с БД выполняется через sync_to_async в потоке запроса, поэтому
+цикл событий не блокируется и медленные клиенты не держат воркер.
+Остальные методы и редкие варианты запросов (поиск по триграммам,
+?format=) передаются обычным вьюхам DRF. Маршруты подключаются
+в backend/asgi_urls.py.
+'''
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from rest_framework.exceptions import APIException
+
+import api.constants as const
+from api.renderers import FastJSONRenderer
+from api.serializers import TagSerializer
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from recipes.models import Tag
+from recipes.search import ingredient_index
+from recipes.short_links import short_links
+
+json_renderer = FastJSONRenderer()
+
+
+def render_json(data, status=200, headers=()):
+    '''Ответ с теми же байтами, что отдаёт JSONRenderer DRF.'''
+    response = HttpResponse(
+        json_renderer.render(data), status=status,
+        content_type=json_renderer.media_type,
+    )
+    for name, value in headers:
+        response[name] = value
+    return response
+
+
+def fast_path(sync_view, authenticates=False):
+    '''Асинхронная вьюха для GET; остальное обслуживает sync_view.
+
+    Если обработчик вернул None, запрос тоже уходит в sync_view.
+    Обработчик без authenticates аутентификацию DRF не проходит,
+    поэтому запросы с заголовком Authorization тоже уходят в sync_view:
+    неверный токен получит 401, как и во всём API.
+    '''
+    sync_view = sync_to_async(sync_view)
+
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if (request.method == 'GET' and 'format' not in request.GET
+                    and (authenticates
+                         or 'HTTP_AUTHORIZATION' not in request.META)):
+                response = await handler(request, *args, **kwargs)
+                if response is not None:
+                    return response
+            return await sync_view(request, *args, **kwargs)
+
+        # Как и вьюхи DRF, CSRF проверяет аутентификация, а не middleware.
+        view.csrf_exempt = True
+        return view
+
+    return decorator
+
+
+async def redirect_link(request, recipe_hash):
+    recipe_id = await sync_to_async(short_links.resolve)(recipe_hash)
+    if not recipe_id:
+        raise Http404('Рецепт не найден.')
+    full_url = request.build_absolute_uri(f'/recipes/{recipe_id}/')
+    return HttpResponseRedirect(full_url)
+
+
+@sync_to_async
+def tag_list():
+    return TagSerializer(Tag.objects.all(), many=True).data
+
+
+@sync_to_async
+def tag_detail(pk):
+    tag = Tag.objects.filter(pk=pk).first()
+    return None if tag is None else TagSerializer(tag).data
+
+
+@fast_path(TagViewSet.as_view({'get': 'list'}))
+async def tags(request):
+    return render_json(await tag_list())
+
+
+@fast_path(TagViewSet.as_view({'get': 'retrieve'}))
+async def tag(request, pk):
+    data = await tag_detail(pk)
+    if data is None:
+        return None
+    return render_json(data)
+
+
+@fast_path(IngredientViewSet.as_view({'get': 'list'}))
+async def ingredients(request):
+    name = request.GET.get('name')
+    if name is None:
+        return None
+    found = await sync_to_async(ingredient_index.search)(
+        name, const.INGREDIENT_SEARCH_LIMIT
+    )
+    if not found and name.strip():
+        return None
+    return render_json(found)
+
+
+@sync_to_async
+def read_recipe(request, pk):
+    '''Ответ RecipeViewSet.retrieve в JSON или None для других форматов.
+
+    Проверки те же, что в dispatch: initial() выполняет согласование
+    формата, аутентификацию, права доступа и ограничение частоты.
+    '''
+    view = RecipeViewSet(action_map={'get': 'retrieve'}, args=(),
+                         kwargs={'pk': pk})
+    view.request = view.initialize_request(request, pk=pk)
+    view.headers = view.default_response_headers
+    try:
+        view.initial(view.request, pk=pk)
+        if not isinstance(view.request.accepted_renderer, FastJSONRenderer):
+            # Например, браузер просит HTML: ответит обычная вьюха DRF.
+            return None
+        instance = view.get_object()
+        return render_json(view.get_serializer(instance).data)
+    except (APIException, Http404) as exc:
+        response = view.handle_exception(exc)
+        return render_json(response.data, response.status_code, [
+            header for header in response.items()
+            if header[0] != 'Content-Type'
+        ])
+
+
+@fast_path(RecipeViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update',
+    'delete': 'destroy',
+}), authenticates=True)
+async def recipe(request, pk):
+    return await read_recipe(request, pk)
@@ -6,5 +6,34 @@ MIN_LEN_VALIDATOR = 1
 MAX_LEN_VALIDATOR = 32000
 
 USER_LEN = 150
-SHORT_CODE_LEN = 6
+SHORT_CODE_LEN = 7
 CODE_MAX_LEN = 10
+
+RECIPES_LIMIT_MAX = 50
+INGREDIENT_SEARCH_LIMIT = 20
+SEARCH_CONFIG = 'russian'
+COUNT_CACHE_TIMEOUT = 60 * 5
+COUNT_ESTIMATE_THRESHOLD = 100000
+SHOPPING_LIST_CHUNK_SIZE = 2000
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60 * 24
+SHORT_LINK_MISSING_TIMEOUT = 60
+SHORT_LINK_LOCAL_SIZE = 10000
+SHORT_LINK_LOCAL_TIMEOUT = 60
+SHORT_LINKS_MAX = 100
+IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1280)
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+IMAGE_MAX_SIDE = 10000
+IMPORT_SOURCE_LEN = 255
+IMPORT_BATCH_SIZE = 1000
+IMPORT_ERRORS_MAX = 100
+CHECKSUM_LEN = 64
+MAX_ID = 2 ** 63 - 1
+RANKING_PERIOD_LEN = 8
+RANKING_WINDOWS = {'day': 1, 'week': 7, 'all': None}
+RANKING_DEFAULT_PERIODS = {'popular': 'all', 'trending': 'day'}
+RANKING_BATCH_SIZE = 5000
+RANKING_REFRESH_EVERY = 60 * 5
+# Добавления, закоммиченные позже своего created, учитываются с запасом.
+RANKING_CREATED_LAG = 60 * 5
+SEARCH_INDEX_MAX_AGE = 60 * 10
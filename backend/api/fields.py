@@ -0,0 +1,99 @@
+'''Связанные поля, которые ищут объекты одним запросом на список.
+
+PrimaryKeyRelatedField делает отдельный запрос на каждый id, поэтому
+рецепт с сорока ингредиентами проверялся сорока запросами. Здесь
+все id списка сначала ищутся одним запросом id__in, а ошибки
+по-прежнему выдаются для каждого элемента отдельно.
+'''
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    '''PrimaryKeyRelatedField с заранее найденными объектами.
+
+    После prefetch() значения берутся из найденных объектов без
+    запросов; без prefetch() поле работает как обычно.
+    '''
+
+    resolved = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            raise TypeError
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            raise ValueError
+
+    def prefetch(self, values):
+        pks = set()
+        for value in values:
+            try:
+                pks.add(self.to_pk(value))
+            except (TypeError, ValueError):
+                continue
+        self.resolved = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        if self.resolved is None:
+            return super().to_internal_value(data)
+        try:
+            pk = self.to_pk(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.resolved:
+            self.fail('does_not_exist', pk_value=data)
+        return self.resolved[pk]
+
+
+class BulkManyRelatedField(ManyRelatedField):
+    '''Список id: один запрос и ошибки вида {индекс: [сообщение]}.'''
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        self.child_relation.prefetch(data)
+        result, errors = [], {}
+        for index, item in enumerate(data):
+            try:
+                result.append(self.child_relation.to_internal_value(item))
+            except serializers.ValidationError as exc:
+                errors[index] = exc.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+        return result
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+    '''Список вложенных объектов с BulkPrimaryKeyRelatedField.
+
+    Перед проверкой элементов id каждого такого поля собираются
+    со всего списка и ищутся одним запросом.
+    '''
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            items = [item for item in data if isinstance(item, Mapping)]
+            for field in self.child._writable_fields:
+                if isinstance(field, BulkPrimaryKeyRelatedField):
+                    field.prefetch(
+                        item[field.field_name] for item in items
+                        if field.field_name in item
+                    )
+        return super().to_internal_value(data)
@@ -1,6 +1,15 @@
-from django_filters.rest_framework import CharFilter, FilterSet, filters
+from django_filters.rest_framework import (CharFilter, ChoiceFilter,
+                                           FilterSet, filters)
 
-from recipes.models import Recipe, Tag
+import api.constants as const
+from recipes.models import Recipe, RecipeRanking, Tag
+from recipes.rankings import order_by_ranking
+from recipes.search import trigram_search
+
+RANKINGS = (
+    ('popular', 'Популярные'),
+    ('trending', 'Набирающие популярность'),
+)
 
 
 class RecipeFilter(FilterSet):
@@ -13,6 +22,11 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='is_in_shopping_cart_filter'
     )
+    name = CharFilter(method='name_filter')
+    search = CharFilter(method='search_filter')
+    ordering = ChoiceFilter(choices=RANKINGS, method='ordering_filter')
+    period = ChoiceFilter(choices=RecipeRanking.PERIODS,
+                          method='period_filter')
 
     class Meta:
         model = Recipe
@@ -21,16 +35,44 @@ class RecipeFilter(FilterSet):
             'author',
         )
 
+    def filter_queryset(self, queryset):
+        # Нечёткий поиск по названию идёт последним: без pg_trgm он
+        # отбирает лучшие совпадения среди уже отфильтрованных рецептов
+        # и не меняет сортировку поиска и рейтинга.
+        cleaned = self.form.cleaned_data
+        for name in sorted(cleaned, key=lambda name: name == 'name'):
+            queryset = self.filters[name].filter(queryset, cleaned[name])
+        return queryset
+
     def is_favorited_filter(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(recipe_favorites__user=user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def is_in_shopping_cart_filter(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(shopping_recipe__user=user)
+            return queryset.filter(is_in_shopping_cart=True)
+        return queryset
+
+    def name_filter(self, queryset, name, value):
+        if value.strip():
+            return trigram_search(queryset, 'name', value)
+        return queryset
+
+    def search_filter(self, queryset, name, value):
+        if value.strip():
+            return queryset.full_text_search(value)
+        return queryset
+
+    def ordering_filter(self, queryset, name, value):
+        period = (self.form.cleaned_data.get('period')
+                  or const.RANKING_DEFAULT_PERIODS[value])
+        return order_by_ranking(queryset, period)
+
+    def period_filter(self, queryset, name, value):
+        # Период читает ordering_filter, сам по себе он не фильтрует.
         return queryset
 
 
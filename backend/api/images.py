@@ -0,0 +1,248 @@
+'''Уменьшенные копии картинок рецептов и аватаров.
+
+Для каждой сохранённой картинки создаются копии шириной
+IMAGE_VARIANT_WIDTHS в WebP и JPEG. Копии лежат рядом с оригиналом
+в папке variants, поэтому их адреса вычисляются по имени файла.
+Готовность копий хранится в модели, в поле <поле картинки>_variants_for
+(имя картинки, для которой копии созданы), так что списки не обращаются
+к хранилищу за каждой картинкой. Pillow работает в пуле процессов, чтобы
+большая картинка не занимала воркер gunicorn. Пул только рисует копии:
+готовность записывается в конце следующего запроса этого процесса
+(mark_finished по сигналу request_finished), а не в служебном потоке
+пула. Копии, оставшиеся неотмеченными, отметит generate_image_variants.
+При замене картинки копии прежней удаляются.
+'''
+import logging
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from queue import Empty, SimpleQueue
+from threading import Lock
+
+from django.conf import settings
+from django.db import transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+import api.constants as const
+
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = Lock()
+# Отметки готовности копий, созданных пулом, до конца запроса.
+_finished = SimpleQueue()
+
+
+def variant_name(name, width, extension):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f'{stem}-{width}.{extension}')
+
+
+def last_variant_name(name):
+    '''Копия, которая записывается последней: если она есть, есть и все.'''
+    return variant_name(name, const.IMAGE_VARIANT_WIDTHS[-1],
+                        list(VARIANT_FORMATS)[-1])
+
+
+def variant_names(name):
+    '''Пары ((ширина, формат), имя копии) в порядке записи.'''
+    return [
+        ((width, extension), variant_name(name, width, extension))
+        for extension in VARIANT_FORMATS
+        for width in const.IMAGE_VARIANT_WIDTHS
+    ]
+
+
+def render_variants(source, targets, quality=const.IMAGE_VARIANT_QUALITY):
+    '''Пишет копии source в targets -- список (путь, ширина, формат).
+
+    Функция не использует Django и выполняется в дочернем процессе.
+    Копии не бывают шире оригинала. Каждый файл сначала пишется
+    во временный и затем переименовывается, так что недописанных
+    копий не видно.
+    '''
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    for path, width, extension in targets:
+        variant = image.copy()
+        variant.thumbnail((width, image.height))
+        if extension == 'jpeg' and variant.mode != 'RGB':
+            background = Image.new('RGB', variant.size, 'white')
+            variant = variant.convert('RGBA')
+            background.paste(variant, mask=variant.getchannel('A'))
+            variant = background
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.tmp'
+        variant.save(temporary, VARIANT_FORMATS[extension], quality=quality)
+        os.replace(temporary, path)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                mp_context=get_context('spawn'),
+            )
+        return _executor
+
+
+def variant_targets(image):
+    '''Аргументы render_variants для картинки из файлового хранилища.'''
+    storage = image.storage
+    return storage.path(image.name), [
+        (storage.path(name), width, extension)
+        for (width, extension), name in variant_names(image.name)
+    ]
+
+
+def ready_field(image):
+    return f'{image.field.name}_variants_for'
+
+
+def variants_ready(image):
+    return bool(image) and getattr(
+        image.instance, ready_field(image), None
+    ) == image.name
+
+
+def mark_ready(model, pk, field, name):
+    '''Отмечает копии готовыми, если картинка за это время не сменилась.
+
+    Возвращает число отмеченных строк.
+    '''
+    return model._base_manager.filter(pk=pk, **{field: name}).update(
+        **{f'{field}_variants_for': name}
+    )
+
+
+def mark_or_discard(storage, model, pk, field, name):
+    '''Отмечает копии готовыми; копии уже заменённой картинки удаляет.'''
+    if not mark_ready(model, pk, field, name):
+        delete_variant_files(storage, name)
+
+
+def variants_done(mark, future):
+    '''Done-callback пула: логирует ошибку или откладывает отметку.
+
+    Вызывается в служебном потоке пула, поэтому к базе не обращается.
+    '''
+    error = future.exception()
+    if error is not None:
+        logger.error('Не удалось создать копии картинки', exc_info=error)
+        return
+    _finished.put(mark)
+
+
+def mark_finished():
+    '''Отмечает готовыми копии, которые пул успел создать.'''
+    while True:
+        try:
+            mark = _finished.get_nowait()
+        except Empty:
+            return
+        mark()
+
+
+def submit_variants(source, targets, mark):
+    future = get_executor().submit(render_variants, source, targets)
+    future.add_done_callback(partial(variants_done, mark))
+
+
+def render_and_mark(source, targets, mark):
+    render_variants(source, targets)
+    mark()
+
+
+def schedule_variants(image):
+    '''Ставит в очередь создание копий после фиксации транзакции.'''
+    if not image:
+        return
+    try:
+        source, targets = variant_targets(image)
+    except NotImplementedError:
+        return
+    mark = partial(mark_or_discard, image.storage, type(image.instance),
+                   image.instance.pk, image.field.name, image.name)
+    if settings.IMAGE_VARIANT_WORKERS:
+        task = partial(submit_variants, source, targets, mark)
+    else:
+        task = partial(render_and_mark, source, targets, mark)
+    transaction.on_commit(task)
+
+
+def delete_variant_files(storage, name):
+    for _, variant in variant_names(name):
+        storage.delete(variant)
+
+
+def delete_variants(image):
+    if not image:
+        return
+    delete_variant_files(image.storage, image.name)
+
+
+def image_variants(image, request=None):
+    '''Адреса копий вида {'webp': {'320w': url, ...}, 'jpeg': {...}}.
+
+    Пока копии не готовы, возвращается пустой словарь. Готовность
+    берётся из модели, хранилище не проверяется.
+    '''
+    if not variants_ready(image):
+        return {}
+    names = variant_names(image.name)
+    result = {extension: {} for extension in VARIANT_FORMATS}
+    for (width, extension), name in names:
+        url = image.storage.url(name)
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        result[extension][f'{width}w'] = url
+    return result
+
+
+class ImageVariantsField(serializers.Field):
+    '''Карта уменьшенных копий картинки для srcset.'''
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return image_variants(value, self.context.get('request'))
+
+
+class ImageVariantsMixin:
+    '''Создаёт копии картинок из image_variant_fields после save().
+
+    Копии заменённой картинки удаляются после фиксации транзакции.
+    '''
+
+    image_variant_fields = ()
+
+    def save(self, **kwargs):
+        fields = [
+            field for field in self.image_variant_fields
+            if field in self.validated_data
+        ]
+        previous = {}
+        for field in fields if self.instance is not None else ():
+            image = getattr(self.instance, field)
+            if image:
+                previous[field] = (image.storage, image.name)
+        instance = super().save(**kwargs)
+        for field in fields:
+            image = getattr(instance, field)
+            if field in previous and previous[field][1] != image.name:
+                transaction.on_commit(
+                    partial(delete_variant_files, *previous[field])
+                )
+            schedule_variants(image)
+        return instance
@@ -1,6 +1,293 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+from functools import partial
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.core.exceptions import (EmptyResultSet, FieldDoesNotExist,
+                                    ValidationError)
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+import api.constants as const
+
+COUNT_VERSION_KEY = 'pagination:count-version'
+
+
+def invalidate_counts():
+    '''Сбрасывает все закешированные количества записей.
+
+    Версия хранится в общем кеше (Redis), поэтому сброс в одном
+    процессе или контейнере (например, refresh_rankings) видят все.
+    Версия -- случайная строка, а не счётчик: после вытеснения ключа
+    не вернутся количества, закешированные под старой версией.
+    '''
+    cache.set(COUNT_VERSION_KEY, uuid4().hex, None)
+
+
+class CountingPaginator(Paginator):
+    '''Paginator с выбираемой стратегией подсчёта записей.
+
+    exact -- COUNT(*) на каждый запрос;
+    cached -- COUNT(*) кешируется по SQL запроса до ближайшей записи
+    рецептов, избранного, корзины или подписок;
+    estimated -- как cached, но для таблиц без фильтров больше
+    COUNT_ESTIMATE_THRESHOLD строк берётся оценка планировщика PostgreSQL.
+    '''
+
+    def __init__(self, object_list, per_page, *args, counting='exact',
+                 **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.counting = counting
+        self.count_is_exact = True
+
+    def get_cache_key(self):
+        sql, params = self.object_list.order_by().query.sql_with_params()
+        version = cache.get_or_set(COUNT_VERSION_KEY, uuid4().hex, None)
+        digest = hashlib.sha256(f'{sql}{params}'.encode()).hexdigest()
+        return f'pagination:count:{version}:{digest}'
+
+    def estimate_count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if (connection.vendor != 'postgresql' or queryset.query.where
+                or queryset.query.distinct):
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                (queryset.model._meta.db_table,),
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < const.COUNT_ESTIMATE_THRESHOLD:
+            return None
+        return int(row[0])
+
+    @cached_property
+    def count(self):
+        if self.counting == 'exact':
+            return self.object_list.count()
+        try:
+            key = self.get_cache_key()
+        except EmptyResultSet:
+            return 0
+        cached = cache.get(key)
+        if cached is None:
+            estimate = None
+            if self.counting == 'estimated':
+                estimate = self.estimate_count()
+            if estimate is None:
+                cached = (self.object_list.count(), True)
+            else:
+                cached = (estimate, False)
+            cache.set(key, cached, const.COUNT_CACHE_TIMEOUT)
+        count, self.count_is_exact = cached
+        return count
+
+
+class KeysetPagination(BasePagination):
+    '''Пагинация по ключу (field, pk) без OFFSET и COUNT(*).
+
+    Курсор непрозрачен для клиента: это значения ключа последней
+    (или первой) записи страницы и направление перехода.
+    '''
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self, ordering, page_size):
+        self.ordering = ordering
+        self.page_size = page_size
+
+    @staticmethod
+    def encode_cursor(position, reverse):
+        payload = json.dumps([*position, reverse], default=str)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            *position, reverse = json.loads(
+                base64.urlsafe_b64decode(cursor.encode())
+            )
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(reverse)
+
+    def clean_position(self, queryset, position):
+        '''Значения курсора, приведённые к типам полей ключа.
+
+        Курсор приходит от клиента, поэтому значения проверяются
+        to_python() и валидаторами поля (аннотации -- по output_field),
+        а не попадают в filter() как есть.
+        '''
+        cleaned = []
+        for name, value in zip(self.ordering, position):
+            name = name.lstrip('-')
+            if name in queryset.query.annotations:
+                field = queryset.query.annotations[name].output_field
+            else:
+                field = queryset.model._meta.get_field(name)
+            if not isinstance(value, (str, int, float)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                value = field.to_python(value)
+                field.run_validators(value)
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            # SQLite не задаёт полям диапазон, поэтому граница явная.
+            if value is None or (isinstance(value, int)
+                                 and abs(value) > const.MAX_ID):
+                raise NotFound(self.invalid_cursor_message)
+            cleaned.append(value)
+        return cleaned
+
+    def seek(self, position, reverse):
+        '''Условие «строго после position» в порядке ordering.'''
+        condition, equal = Q(), Q()
+        for field, value in zip(self.ordering, position):
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        cursor = request.query_params.get(self.cursor_query_param)
+        ordering = self.ordering
+        position, reverse = None, False
+        if cursor:
+            position, reverse = self.decode_cursor(cursor)
+        if reverse:
+            ordering = [
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            position = self.clean_position(queryset, position)
+            queryset = queryset.filter(self.seek(position, reverse))
+
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, bool(cursor)
+        self.page = page
+        return page
+
+    def get_link(self, obj, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(self.get_position(obj), reverse),
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.get_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
 
 
 class PageLimitPagination(PageNumberPagination):
+    '''Постраничная пагинация с необязательным режимом курсора.
+
+    Если во вьюсете задан cursor_ordering и в запросе есть параметр
+    cursor (в том числе пустой), страница выбирается по ключу
+    без подсчёта общего числа записей. Ключ повторяет сортировку
+    queryset (поиск, рейтинг), а без неё -- cursor_ordering; последнее
+    поле cursor_ordering (уникальное) разбивает ничьи. Иначе число
+    записей считается
+    стратегией из атрибута вьюсета pagination_count
+    (см. CountingPaginator), а ответ сообщает, точное ли оно.
+    '''
+
     page_size = 6
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+
+    unsupported_ordering_message = 'Курсор недоступен для этой сортировки.'
+
+    def get_cursor_ordering(self, queryset, ordering):
+        active = queryset.query.order_by
+        if not active:
+            return tuple(ordering)
+        names = []
+        for field in active:
+            name = field.lstrip('-') if isinstance(field, str) else None
+            if name not in queryset.query.annotations:
+                try:
+                    model_field = queryset.model._meta.get_field(name)
+                except (FieldDoesNotExist, TypeError):
+                    model_field = None
+                if (model_field is None or not model_field.concrete
+                        or model_field.is_relation):
+                    raise ParseError(self.unsupported_ordering_message)
+            names.append(name)
+        unique = ordering[-1]
+        if unique.lstrip('-') in names:
+            return tuple(active)
+        return (*active, unique)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'cursor_ordering', None)
+        self.keyset = None
+        if ordering and self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(
+                self.get_cursor_ordering(queryset, ordering),
+                self.get_page_size(request),
+            )
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.django_paginator_class = partial(
+            CountingPaginator,
+            counting=getattr(view, 'pagination_count', 'exact'),
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_exact', self.page.paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,14 @@
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    '''Тело application/x-ndjson как поток строк без разбора.
+
+    request.data -- итератор по строкам (bytes), поэтому импорт читает
+    тело построчно и не держит его в памяти целиком.
+    '''
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream if stream is not None else ()
@@ -0,0 +1,137 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+
+from django.http import Http404
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FormatContentNegotiation(DefaultContentNegotiation):
+    '''Выбор рендерера только по параметру format.
+
+    Заголовок Accept не учитывается: без format отдаётся первый
+    рендерер вьюхи, с неизвестным format -- 404.
+    '''
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format_query = format_suffix or request.query_params.get(
+            self.settings.URL_FORMAT_OVERRIDE
+        )
+        if not format_query:
+            return renderers[0], renderers[0].media_type
+        for renderer in renderers:
+            if renderer.format == format_query:
+                return renderer, renderer.media_type
+        raise Http404
+
+
+class ShoppingListRenderer(ABC, BaseRenderer):
+    '''Список покупок, который отдаётся потоком по строкам.
+
+    render() нужен только для ошибок (401 и т.п.), сам список
+    формирует генератор stream() из строк агрегата ингредиентов.
+    '''
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        if not isinstance(data, str):
+            data = json.dumps(data, ensure_ascii=False)
+        return data.encode(self.charset)
+
+    @abstractmethod
+    def stream(self, rows):
+        '''Части ответа (str) из строк агрегата ингредиентов.'''
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield 'Список покупок:\n'
+        separator = ''
+        for row in rows:
+            yield (f"{separator}{row['ingredient__name']} - "
+                   f"{row['total_amount']} "
+                   f"{row['ingredient__measurement_unit']}.")
+            separator = '\n'
+
+
+class Echo:
+    '''Буфер для csv.writer, который сразу возвращает строку.'''
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')
+        )
+        for row in rows:
+            yield writer.writerow((
+                row['ingredient__name'],
+                row['total_amount'],
+                row['ingredient__measurement_unit'],
+            ))
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, rows):
+        yield '['
+        separator = ''
+        for row in rows:
+            yield separator + json.dumps({
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['total_amount'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']'
+
+
+class FastJSONRenderer(JSONRenderer):
+    '''JSONRenderer на orjson с теми же байтами на выходе.
+
+    orjson пишет компактный JSON в UTF-8 без экранирования, как DRF
+    с настройками по умолчанию. Для отступов (?indent или Accept)
+    и типов, которых orjson не знает (Decimal, ленивые строки, ключи
+    не-строки), используется обычный рендерер. Дробные числа orjson
+    пишет иначе (1e20 вместо 1e+20, NaN как null), поэтому рендерер
+    подключается только к вьюхам, в ответах которых их нет.
+    '''
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None
+            or self.get_indent(accepted_media_type or '',
+                               renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            content = orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        # Как и DRF, экранируем разделители строк для встраивания в JS.
+        return content.replace('\u2028'.encode(), b'\\u2028').replace(
+            '\u2029'.encode(), b'\\u2029'
+        )
@@ -1,10 +1,16 @@
-from django.db.models import F
+from django.db import transaction
 from drf_base64.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
 
+import api.constants as const
+from api.fields import BulkPrimaryKeyRelatedField, BulkRelatedListSerializer
+from api.images import (ImageVariantsField, ImageVariantsMixin,
+                        image_variants)
+from api.uploads import ImageUploadField
 from recipes.models import (Ingredient, Tag, Recipe,
-                            RecipeIngredient, Favorite, ShoppingCart)
+                            RecipeIngredient, Favorite, ShoppingCart,
+                            ShoppingListItem)
 from users.models import User, Subscribe
 
 
@@ -12,6 +18,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
     '''Сериализатор для юзера.'''
 
     is_subscribed = SerializerMethodField()
+    avatar_variants = ImageVariantsField(source='avatar')
 
     class Meta:
         model = User
@@ -23,28 +30,31 @@ class UserCreateSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_variants',
         )
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        return bool(
-            request
-            and request.user.is_authenticated
-            and Subscribe.objects.filter(subscriber=request.user,
-                                         author=obj,).exists()
-        )
+        if not request or not request.user.is_authenticated:
+            return False
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is not None:
+            return obj.pk in subscriptions
+        return Subscribe.objects.filter(subscriber=request.user,
+                                        author=obj,).exists()
 
 
 class RecipeSmallSerializer(serializers.ModelSerializer):
     '''Список рецептов без ингридиентов.'''
 
     image = Base64ImageField(read_only=True)
+    image_variants = ImageVariantsField(source='image')
     name = serializers.ReadOnlyField()
     cooking_time = serializers.ReadOnlyField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class ShoppingCartCreateSerializer(serializers.ModelSerializer):
@@ -105,13 +115,36 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+class RecipeIngredientReadSerializer(serializers.ModelSerializer):
+    '''Ингредиент рецепта с количеством.'''
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
-    '''Сериализатор для списка рецептов.'''
+    '''Сериализатор для списка рецептов.
+
+    Поля ниже описывают схему ответа, а сам ответ собирает
+    to_representation напрямую из рецепта и подгруженных связей:
+    вложенные сериализаторы на каждую строку занимали большую часть
+    времени списка. Результат совпадает с обычным ModelSerializer.
+    '''
 
     author = UserCreateSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
-    ingredients = serializers.SerializerMethodField()
+    ingredients = RecipeIngredientReadSerializer(
+        source='recipe', many=True, read_only=True
+    )
     image = Base64ImageField()
+    image_variants = ImageVariantsField(source='image')
     is_in_shopping_cart = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
 
@@ -126,11 +159,79 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
+            'favorites_count',
+            'shopping_carts_count',
         )
 
+    def file_url(self, file):
+        '''Как ImageField.to_representation: абсолютный URL или None.'''
+        if not file:
+            return None
+        try:
+            url = file.url
+        except AttributeError:
+            return None
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.authors = {}
+
+    def author_representation(self, author):
+        # У рецептов одной страницы авторы часто повторяются.
+        if author.pk in self.authors:
+            return self.authors[author.pk]
+        request = self.context.get('request')
+        self.authors[author.pk] = {
+            'email': author.email,
+            'id': author.pk,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+            'is_subscribed': self.fields['author'].get_is_subscribed(author),
+            'avatar': self.file_url(author.avatar),
+            'avatar_variants': image_variants(author.avatar, request),
+        }
+        return self.authors[author.pk]
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        return {
+            'id': instance.pk,
+            'tags': [
+                {'id': tag.pk, 'name': tag.name, 'slug': tag.slug}
+                for tag in instance.tags.all()
+            ],
+            'author': self.author_representation(instance.author),
+            'ingredients': [
+                {
+                    'id': item.ingredient.pk,
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in instance.recipe.all()
+            ],
+            'is_favorited': self.get_is_favorited(instance),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(instance),
+            'name': instance.name,
+            'image': self.file_url(instance.image),
+            'image_variants': image_variants(instance.image, request),
+            'text': instance.text,
+            'cooking_time': instance.cooking_time,
+            'favorites_count': instance.favorites_count,
+            'shopping_carts_count': instance.shopping_carts_count,
+        }
+
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return bool(
             request
@@ -140,6 +241,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return bool(
             request
@@ -148,20 +251,11 @@ class RecipeReadSerializer(serializers.ModelSerializer):
                                         recipe=obj).exists()
         )
 
-    def get_ingredients(self, obj):
-        ingredients = obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('ingredients__amount'),
-        )
-        return ingredients
-
 
 class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
     '''Ингредиент и количество для создания рецепта.'''
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = BulkPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
 
     class Meta:
         model = RecipeIngredient
@@ -169,17 +263,21 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
             'id',
             'amount',
         )
+        list_serializer_class = BulkRelatedListSerializer
 
 
-class RecipeCreateSerializer(serializers.ModelSerializer):
+class RecipeCreateSerializer(ImageVariantsMixin,
+                             serializers.ModelSerializer):
     '''Создание, изменение и удаление рецепта.'''
 
+    image_variant_fields = ('image',)
+
     author = UserCreateSerializer(read_only=True)
     ingredients = RecipeIngredientCreateSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all()
     )
-    image = Base64ImageField()
+    image = ImageUploadField()
 
     class Meta:
         model = Recipe
@@ -195,97 +293,145 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
 
     def validate(self, obj):
-        tags = obj.get('tags', [])
-        ingredients = obj.get('ingredients', [])
-
-        if len(tags) != len(set(tags)):
-            raise serializers.ValidationError('Теги должны быть уникальными.')
-
-        if not tags:
-            raise serializers.ValidationError(
-                'Должен быть указан минимум 1 тег.')
-
-        ingredients = obj.get('ingredients', [])
-        if not ingredients:
-            raise serializers.ValidationError(
-                'Должен быть указан минимум 1 ингредиент.')
-
-        ingredient_ids = [ingredient['id'] for ingredient in ingredients]
-
-        if len(ingredient_ids) != len(set(ingredient_ids)):
-            raise serializers.ValidationError(
-                'Ингредиенты должны быть уникальными.')
-
-        if tags is None or ingredients is None:
-            raise serializers.ValidationError(
-                'Должны быть указаны теги и ингредиенты.')
+        # При PATCH без тегов или ингредиентов они остаются как были.
+        if 'tags' in obj or not self.partial:
+            tags = obj.get('tags', [])
+            if len(tags) != len(set(tags)):
+                raise serializers.ValidationError(
+                    'Теги должны быть уникальными.')
+            if not tags:
+                raise serializers.ValidationError(
+                    'Должен быть указан минимум 1 тег.')
+
+        if 'ingredients' in obj or not self.partial:
+            ingredients = obj.get('ingredients', [])
+            if not ingredients:
+                raise serializers.ValidationError(
+                    'Должен быть указан минимум 1 ингредиент.')
+            ingredient_ids = [
+                ingredient['id'] for ingredient in ingredients
+            ]
+            if len(ingredient_ids) != len(set(ingredient_ids)):
+                raise serializers.ValidationError(
+                    'Ингредиенты должны быть уникальными.')
 
         return obj
 
-    def tags_and_ingredients_set(self, recipe, tags, ingredients):
-        recipe.tags.set(tags)
+    def set_ingredients(self, recipe, ingredients):
+        '''Приводит ингредиенты рецепта к ingredients.
 
-        RecipeIngredient.objects.bulk_create(
-            RecipeIngredient(
-                recipe=recipe,
-                ingredient=ingredient_data['id'],
-                amount=ingredient_data['amount'],
-            )
+        Удаляет, меняет и добавляет только отличающиеся строки
+        и возвращает id затронутых ингредиентов.
+        '''
+        current = {item.ingredient_id: item for item in recipe.recipe.all()}
+        wanted = {
+            ingredient_data['id'].pk: ingredient_data['amount']
             for ingredient_data in ingredients
+        }
+        removed = current.keys() - wanted.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                pk__in=[current[pk].pk for pk in removed]
+            ).delete()
+        changed = []
+        for pk, item in current.items():
+            if pk in wanted and item.amount != wanted[pk]:
+                item.amount = wanted[pk]
+                changed.append(item)
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        added = wanted.keys() - current.keys()
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=pk,
+                             amount=wanted[pk])
+            for pk in added
         )
+        return removed | added | {item.ingredient_id for item in changed}
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
-        self.tags_and_ingredients_set(recipe, tags, ingredients)
+        recipe.tags.set(tags)
+        self.set_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
         instance = super().update(instance, validated_data)
-        instance.ingredients.clear()
-        self.tags_and_ingredients_set(instance, tags, ingredients)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            changed = self.set_ingredients(instance, ingredients)
+            if changed:
+                ShoppingListItem.objects.refresh_recipe(instance, changed)
         return instance
 
     def to_representation(self, instance):
-        return RecipeReadSerializer(
-            instance, context={'request': self.context.get('request')}
-        ).data
+        request = self.context.get('request')
+        if request:
+            instance = Recipe.objects.with_user_flags(
+                request.user
+            ).with_related().get(pk=instance.pk)
+        return RecipeReadSerializer(instance, context=self.context).data
 
 
 class SubscribeDisplaySerializer(UserCreateSerializer):
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta(UserCreateSerializer.Meta):
         model = User
         fields = UserCreateSerializer.Meta.fields + (
             'recipes',
             'recipes_count',
+            'followers_count',
         )
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-
-        if limit:
-            try:
-                limit = int(limit)
-                recipes = recipes[:limit]
-            except ValueError:
-                pass
+        recipes = getattr(obj, 'latest_recipes', None)
+        if recipes is None:
+            limit = self.context.get('recipes_limit',
+                                     const.RECIPES_LIMIT_MAX)
+            recipes = obj.recipes.all()[:limit]
 
         serializer = RecipeSmallSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
 
+class RecipesLimitSerializer(serializers.Serializer):
+    '''Проверка параметра recipes_limit.'''
+
+    recipes_limit = serializers.IntegerField(
+        min_value=0, default=const.RECIPES_LIMIT_MAX
+    )
+
+    def validate_recipes_limit(self, value):
+        return min(value, const.RECIPES_LIMIT_MAX)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    '''Проверка списка id рецептов: ?ids=1,2,3 или ?ids=1&ids=2.'''
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=const.SHORT_LINKS_MAX,
+    )
+
+    def to_internal_value(self, data):
+        ids = [
+            part.strip()
+            for value in data.getlist('ids')
+            for part in value.split(',') if part.strip()
+        ]
+        return super().to_internal_value({'ids': ids})
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
 class SubscribeCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -310,13 +456,15 @@ class SubscribeCreateSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         return SubscribeDisplaySerializer(
-            instance.author, context={'request': self.context.get('request')}
+            instance.author, context=self.context
         ).data
 
 
-class UserAvatarSerializer(serializers.ModelSerializer):
-    avatar = Base64ImageField(required=True)
+class UserAvatarSerializer(ImageVariantsMixin, serializers.ModelSerializer):
+    avatar = ImageUploadField(required=True)
+    avatar_variants = ImageVariantsField(source='avatar')
+    image_variant_fields = ('avatar',)
 
     class Meta:
         model = User
-        fields = ('avatar',)
+        fields = ('avatar', 'avatar_variants')
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe
+from .images import mark_finished
+from .pagination import invalidate_counts
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscribe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_pagination_counts(sender, **kwargs):
+    invalidate_counts()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_counts(sender, created=True, **kwargs):
+    if created:
+        invalidate_counts()
+
+
+@receiver(request_finished)
+def mark_finished_variants(sender, **kwargs):
+    mark_finished()
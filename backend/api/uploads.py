@@ -0,0 +1,132 @@
+'''Загрузка картинок через multipart/form-data.
+
+Файл пишется во временный файл по частям. Размер и габариты картинки
+проверяются по мере чтения тела запроса: слишком большой файл
+отклоняется, не дочитывая его до конца. Base64 внутри JSON
+по-прежнему принимается тем же полем.
+'''
+import json
+
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.datastructures import MultiValueDict
+from drf_base64.fields import Base64ImageField
+from PIL import ImageFile
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import (DataAndFiles, FormParser, JSONParser,
+                                    MultiPartParser)
+
+import api.constants as const
+
+SIZE_MESSAGE = (
+    f'Размер файла не должен превышать '
+    f'{const.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ.'
+)
+SIDE_MESSAGE = (
+    f'Стороны картинки не должны превышать {const.IMAGE_MAX_SIDE} пикселей.'
+)
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = SIZE_MESSAGE
+    default_code = 'upload_too_large'
+
+
+class ImageLimitsUploadHandler(TemporaryFileUploadHandler):
+    '''Пишет файлы на диск и проверяет лимиты по мере получения данных.'''
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if content_length > const.IMAGE_UPLOAD_MAX_SIZE:
+            raise UploadTooLarge()
+        return super().handle_raw_input(
+            input_data, META, content_length, boundary, encoding
+        )
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header_parser = ImageFile.Parser()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > const.IMAGE_UPLOAD_MAX_SIZE:
+            raise UploadTooLarge()
+        if self.header_parser is not None:
+            self.check_dimensions(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def check_dimensions(self, raw_data):
+        # Заголовок картинки разбирается по первым частям файла,
+        # дальше данные в Pillow не передаются.
+        try:
+            self.header_parser.feed(raw_data)
+        except Exception:
+            self.header_parser = None
+            return
+        image = self.header_parser.image
+        if image is None:
+            return
+        self.header_parser = None
+        if max(image.size) > const.IMAGE_MAX_SIDE:
+            raise serializers.ValidationError(
+                {self.field_name: [SIDE_MESSAGE]}
+            )
+
+
+class MultipartJsonData(dict):
+    '''JSON из поля data, к которому Request добавит файлы формы.
+
+    Request объединяет данные с файлами через copy() и update(); у
+    обычного словаря значения файлов стали бы списками MultiValueDict.
+    '''
+
+    def copy(self):
+        return type(self)(self)
+
+    def update(self, other=(), **kwargs):
+        if isinstance(other, MultiValueDict):
+            other = other.dict()
+        super().update(other, **kwargs)
+
+
+class MultipartJsonParser(MultiPartParser):
+    '''multipart/form-data, где поле data содержит остальной JSON.
+
+    Так вложенные поля (ингредиенты, теги) передаются вместе с файлом:
+    data={"name": ..., "ingredients": [...]}, image=<файл>.
+    Без поля data форма разбирается как обычно.
+    '''
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        request.upload_handlers = [ImageLimitsUploadHandler(request)]
+        result = super().parse(stream, media_type, parser_context)
+        if 'data' not in result.data:
+            return result
+        try:
+            data = json.loads(result.data['data'])
+        except ValueError as exc:
+            raise ParseError(f'Поле data должно содержать JSON: {exc}')
+        if not isinstance(data, dict):
+            raise ParseError('Поле data должно содержать JSON-объект.')
+        return DataAndFiles(MultipartJsonData(data), result.files)
+
+
+class ImageUploadField(Base64ImageField):
+    '''Картинка из base64-строки или файла multipart с проверкой лимитов.'''
+
+    def to_internal_value(self, data):
+        image = super().to_internal_value(data)
+        if image.size > const.IMAGE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(SIZE_MESSAGE)
+        if max(image.image.size) > const.IMAGE_MAX_SIDE:
+            raise serializers.ValidationError(SIDE_MESSAGE)
+        return image
+
+
+class ImageUploadMixin:
+    '''Принимает JSON и multipart/form-data с потоковой записью файлов.'''
+
+    parser_classes = (JSONParser, FormParser, MultipartJsonParser)
@@ -1,39 +1,77 @@
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Prefetch, Sum, prefetch_related_objects
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import (Http404, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import filters, mixins, permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 
+import api.constants as const
+from api.images import delete_variants
 from api.pagination import PageLimitPagination
+from api.parsers import NDJSONParser
+from api.renderers import (FastJSONRenderer, FormatContentNegotiation,
+                           ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+                           ShoppingListTextRenderer)
 from api.serializers import (UserAvatarSerializer, IngredientSerializer,
                              TagSerializer, RecipeReadSerializer,
                              RecipeCreateSerializer, UserCreateSerializer,
                              SubscribeCreateSerializer,
                              SubscribeDisplaySerializer, FavoriteSerializer,
-                             ShoppingCartCreateSerializer, RecipeIngredient)
+                             RecipeIdsSerializer, RecipesLimitSerializer,
+                             ShoppingCartCreateSerializer)
+from api.uploads import ImageUploadMixin
 from backend.settings import FILE_NAME
-from recipes.models import (Favorite, Ingredient, Recipe,
-                            ShoppingCart, Tag)
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.ndjson import RecipeImporter, export_recipes
+from recipes.search import ingredient_index, trigram_search
+from recipes.short_links import short_links
 from users.models import User, Subscribe
 from .filters import IngredientFilter, RecipeFilter
 from .permissions import IsAuthorOrReadOnly
 
 
 def redirect_link(request, recipe_hash):
-    recipe = get_object_or_404(Recipe, short_code=recipe_hash)
-    relative_url = '/recipes/' + str(recipe.pk) + '/'
+    recipe_id = short_links.resolve(recipe_hash)
+    if recipe_id is None:
+        raise Http404('Рецепт не найден.')
+    relative_url = '/recipes/' + str(recipe_id) + '/'
     full_url = request.build_absolute_uri(relative_url)
     return HttpResponseRedirect(full_url)
 
 
-class UserCustomViewSet(UserViewSet):
+class SubscriptionsContextMixin:
+    '''Загружает подписки пользователя один раз на запрос.'''
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        user = self.request.user
+        if user.is_authenticated:
+            context['subscriptions'] = set(
+                user.subscriber.values_list('author_id', flat=True)
+            )
+        return context
+
+
+class UserCustomViewSet(ImageUploadMixin, SubscriptionsContextMixin,
+                        UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserCreateSerializer
     pagination_class = PageLimitPagination
+    cursor_ordering = ('username', 'id')
+    pagination_count = 'cached'
+
+    def get_recipes_limit(self):
+        serializer = RecipesLimitSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['recipes_limit']
 
     @action(
         detail=False,
@@ -62,6 +100,7 @@ class UserCustomViewSet(UserViewSet):
     def delete_avatar(self, request):
         user = self.get_instance()
         if user.avatar:
+            delete_variants(user.avatar)
             user.avatar.delete()
             user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -73,14 +112,20 @@ class UserCustomViewSet(UserViewSet):
         pagination_class=PageLimitPagination,
     )
     def subscriptions(self, request):
-        subscriptions = Subscribe.objects.filter(subscriber=request.user)
-        subscribing_users = User.objects.filter(
-            subscribing__in=subscriptions
-        )
+        recipes_limit = self.get_recipes_limit()
+        authors = User.objects.filter(
+            subscribing__subscriber=request.user
+        ).order_by('username')
+        page = self.paginate_queryset(authors)
+        prefetch_related_objects(page, Prefetch(
+            'recipes',
+            queryset=Recipe.objects.latest_per_author(page, recipes_limit),
+            to_attr='latest_recipes',
+        ))
+        context = self.get_serializer_context()
+        context['recipes_limit'] = recipes_limit
         serializer = SubscribeDisplaySerializer(
-            self.paginate_queryset(subscribing_users),
-            many=True,
-            context={'request': request},
+            page, many=True, context=context,
         )
         return self.get_paginated_response(serializer.data)
 
@@ -89,6 +134,7 @@ class UserCustomViewSet(UserViewSet):
         methods=('post',),
         permission_classes=(IsAuthenticated,),
     )
+    @transaction.atomic
     def subscribe(self, request, **kwargs):
         author_id = self.kwargs.get('id')
         author = get_object_or_404(User, id=author_id).pk
@@ -98,7 +144,10 @@ class UserCustomViewSet(UserViewSet):
         }
 
         serializer = SubscribeCreateSerializer(
-            data=data, context={'request': request}
+            data=data, context={
+                'request': request,
+                'recipes_limit': self.get_recipes_limit(),
+            }
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -107,6 +156,7 @@ class UserCustomViewSet(UserViewSet):
         )
 
     @subscribe.mapping.delete
+    @transaction.atomic
     def unsubscribe(self, request, id=None):
         author_id = get_object_or_404(User, pk=id).pk
         deleted_count, _ = Subscribe.objects.filter(
@@ -145,15 +195,42 @@ class IngredientViewSet(
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     filterset_class = IngredientFilter
 
-
-class RecipeViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        ingredients = ingredient_index.search(
+            name, const.INGREDIENT_SEARCH_LIMIT
+        )
+        if not ingredients and name.strip():
+            ingredients = self.get_serializer(
+                trigram_search(Ingredient.objects.all(), 'name', name)[
+                    :const.INGREDIENT_SEARCH_LIMIT
+                ],
+                many=True,
+            ).data
+        return Response(ingredients)
+
+
+class RecipeViewSet(ImageUploadMixin, SubscriptionsContextMixin,
+                    viewsets.ModelViewSet):
     '''Вьюсет рецептов.'''
 
     queryset = Recipe.objects.all()
     pagination_class = PageLimitPagination
+    pagination_count = 'estimated'
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+
+    # Для поиска и ?ordering= ключ курсора берётся из их сортировки.
+    cursor_ordering = ('-pub_date', '-id')
+
+    def get_queryset(self):
+        return Recipe.objects.with_user_flags(
+            self.request.user
+        ).with_related()
 
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
@@ -168,6 +245,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=True,
         permission_classes=(IsAuthenticated,),
     )
+    @transaction.atomic
     def favorite(self, request, pk):
         user = self.request.user
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -181,6 +259,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @favorite.mapping.delete
+    @transaction.atomic
     def delete_favorite(self, request, pk):
         user = self.request.user
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -201,6 +280,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=True,
         permission_classes=[IsAuthenticated],
     )
+    @transaction.atomic
     def shopping_cart(self, request, pk=None):
         user = self.request.user
         recipe = get_object_or_404(Recipe, pk=pk).pk
@@ -219,6 +299,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
+    @transaction.atomic
     def remove_from_shopping_cart(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
         deleted_item, _ = ShoppingCart.objects.filter(
@@ -238,25 +319,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=False,
         methods=('get',),
         permission_classes=[IsAuthenticated],
+        renderer_classes=(ShoppingListTextRenderer, ShoppingListCSVRenderer,
+                          ShoppingListJSONRenderer),
+        content_negotiation_class=FormatContentNegotiation,
     )
     def download_shopping_cart(self, request, **kwargs):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_recipe__user=request.user).values(
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user).values(
                 'ingredient__name', 'ingredient__measurement_unit').annotate(
                     total_amount=Sum('amount')).order_by(
             'ingredient__name', 'ingredient__measurement_unit'
         )
 
-        shopping_list = [
-            (f"{item['ingredient__name']} - "
-             f"{item['total_amount']} {item['ingredient__measurement_unit']}.")
-            for item in ingredients
-        ]
-
-        response_content = 'Список покупок:\n' + '\n'.join(shopping_list)
-        response = HttpResponse(response_content, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename={FILE_NAME}'
-
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator(
+                chunk_size=const.SHOPPING_LIST_CHUNK_SIZE
+            )),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={FILE_NAME}.{renderer.format}'
+        )
         return response
 
     @action(
@@ -266,6 +350,57 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path='get-link'
     )
     def get_link(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        full_url = request.build_absolute_uri(f'/s/{recipe.short_code}')
+        try:
+            code = short_links.codes([int(pk)])[int(pk)]
+        except (KeyError, ValueError):
+            raise Http404('Рецепт не найден.')
+        full_url = request.build_absolute_uri(f'/s/{code}')
         return Response({'short-link': full_url}, status=status.HTTP_200_OK)
+
+    @action(
+        methods=('get',),
+        detail=False,
+        permission_classes=(AllowAny,),
+        url_path='get-links'
+    )
+    def get_links(self, request):
+        serializer = RecipeIdsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        codes = short_links.codes(serializer.validated_data['ids'])
+        return Response(
+            [
+                {'id': pk,
+                 'short-link': request.build_absolute_uri(f'/s/{code}')}
+                for pk, code in codes.items()
+            ],
+            status=status.HTTP_200_OK,
+        )
+
+    @action(
+        methods=('get',),
+        detail=False,
+        permission_classes=(IsAdminUser,),
+        url_path='export'
+    )
+    def export(self, request):
+        response = StreamingHttpResponse(
+            export_recipes(), content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = 'attachment; filename=recipes.ndjson'
+        return response
+
+    @action(
+        methods=('post',),
+        detail=False,
+        permission_classes=(IsAdminUser,),
+        parser_classes=(NDJSONParser,),
+        url_path='import'
+    )
+    def import_recipes(self, request):
+        # NDJSONParser отдаёт в request.data поток строк тела.
+        importer = RecipeImporter(source=request.query_params.get('source'))
+        importer.run(
+            request.data,
+            resume=request.query_params.get('resume') in ('1', 'true'),
+        )
+        return Response(importer.summary, status=status.HTTP_200_OK)
@@ -1,7 +1,76 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Асинхронные версии частых запросов, см. api/async_views.py.
+os.environ.setdefault('ROOT_URLCONF', 'backend.asgi_urls')
 
-application = get_asgi_application()
+# Сколько байт потокового ответа читать за один переход в поток запроса.
+STREAM_BATCH_SIZE = 64 * 1024
+
+
+def read_batch(iterator):
+    '''Следующие части ответа общим размером до STREAM_BATCH_SIZE.'''
+    parts, size = [], 0
+    for part in iterator:
+        parts.append(part)
+        size += len(part)
+        if size >= STREAM_BATCH_SIZE:
+            break
+    return parts
+
+
+class StreamingASGIHandler(ASGIHandler):
+    '''ASGIHandler, который читает потоковые ответы в потоке запроса.
+
+    Django 3.2 перебирает StreamingHttpResponse прямо в цикле событий,
+    и запросы к БД внутри генератора (список покупок, экспорт рецептов)
+    падают с SynchronousOnlyOperation. Здесь генератор читается пачками
+    через sync_to_async в том же потоке, где работала вьюха.
+    '''
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (str(header).encode('ascii'), str(value).encode('latin1'))
+            for header, value in response.items()
+        ]
+        headers.extend(
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        iterator = iter(response)
+        read = sync_to_async(read_batch, thread_sensitive=True)
+        while True:
+            parts = await read(iterator)
+            if not parts:
+                break
+            for part in parts:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+django.setup(set_prefix=False)
+django_application = StreamingASGIHandler()
+
+
+async def application(scope, receive, send):
+    # Django 3.2 выполняет синхронный код всех запросов в одном общем
+    # потоке. Как в Django 4.0, у каждого запроса будет свой поток.
+    async with ThreadSensitiveContext():
+        await django_application(scope, receive, send)
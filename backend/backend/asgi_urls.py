@@ -0,0 +1,13 @@
+from django.urls import path
+
+from api import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('s/<str:recipe_hash>/', async_views.redirect_link,
+         name='redirect-link'),
+    path('api/tags/', async_views.tags),
+    path('api/tags/<int:pk>/', async_views.tag),
+    path('api/ingredients/', async_views.ingredients),
+    path('api/recipes/<int:pk>/', async_views.recipe),
+] + sync_urlpatterns
@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -8,6 +10,18 @@ SECRET_KEY = os.getenv("SECRET_KEY", default="token")
 
 DEBUG = os.getenv("DEBUG", default=False) == "True"
 
+# Тесты запускаются с TESTING=True: без SHORT_CODE_KEY, REDIS_URL и
+# POSTGRES_DB настройки тогда берут значения для разработки.
+TESTING = os.getenv('TESTING') == 'True'
+
+# Ключ перестановки коротких ссылок (recipes/short_links.py). Отдельный
+# от SECRET_KEY: его смена не должна менять коды новых рецептов.
+SHORT_CODE_KEY = os.getenv("SHORT_CODE_KEY")
+if not SHORT_CODE_KEY:
+    if not (DEBUG or TESTING):
+        raise ImproperlyConfigured('Не задана переменная SHORT_CODE_KEY.')
+    SHORT_CODE_KEY = 'short-code-key-for-development'
+
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", default="localhost").split(",")
 
 
@@ -20,6 +34,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -38,7 +53,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'backend.urls'
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'backend.urls')
 
 TEMPLATES = [
     {
@@ -59,16 +74,43 @@ TEMPLATES = [
 WSGI_APPLICATION = 'backend.wsgi.application'
 
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('POSTGRES_DB'),
-        'USER': os.getenv('POSTGRES_USER'),
-        'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
-        'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+if os.getenv('POSTGRES_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB'),
+            'USER': os.getenv('POSTGRES_USER'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
+            'HOST': os.getenv('DB_HOST'),
+            'PORT': os.getenv('DB_PORT')
+        }
     }
-}
+elif DEBUG or TESTING or os.getenv('USE_SQLITE') == 'True':
+    # Локальная SQLite -- только для тестов и разработки, иначе
+    # ошибка в .env незаметно подменила бы рабочую БД пустой.
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+else:
+    raise ImproperlyConfigured(
+        'Не задана переменная POSTGRES_DB (для SQLite -- USE_SQLITE=True).'
+    )
+
+# Общий для всех воркеров и контейнеров кеш: версии индексов поиска,
+# количества записей и короткие ссылки сбрасываются в одном процессе,
+# а читаются во всех. Локальный кеш допустим только для разработки.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+elif not (DEBUG or TESTING):
+    raise ImproperlyConfigured('Не задана переменная REDIS_URL.')
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -132,4 +174,7 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-FILE_NAME = 'shopping_cart.txt'
+FILE_NAME = 'shopping_cart'
+
+# Процессы для уменьшенных копий картинок; 0 -- в потоке запроса.
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
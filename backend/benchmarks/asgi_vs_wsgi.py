@@ -0,0 +1,182 @@
+'''Пропускная способность и задержки: gunicorn WSGI против ASGI (uvicorn).
+
+Оба режима запускаются с одинаковым числом воркеров, память процессов
+выводится рядом с результатами. Часть клиентов отправляет запрос
+медленно, по одному байту, как плохая мобильная сеть: синхронный
+воркер ждёт такого клиента целиком, асинхронный -- нет.
+
+Запуск из каталога backend после migrate, load_ingredients и создания
+хотя бы одного рецепта (нужны gunicorn и uvicorn):
+    python benchmarks/asgi_vs_wsgi.py --workers 2 --clients 32 --slow 8
+'''
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from recipes.models import Ingredient, Recipe, Tag  # noqa: E402
+
+MODES = {
+    'wsgi': ('backend.wsgi',),
+    'asgi': ('-k', 'uvicorn.workers.UvicornWorker', 'backend.asgi'),
+}
+SLOW_BYTE_DELAY = 0.05
+
+
+def percentile(timings, share):
+    return sorted(timings)[max(int(len(timings) * share) - 1, 0)]
+
+
+def benchmark_urls():
+    recipe = Recipe.objects.order_by('pk').first()
+    ingredient = Ingredient.objects.order_by('pk').first()
+    if recipe is None or ingredient is None or not Tag.objects.exists():
+        sys.exit('Нужны рецепт, тег и ингредиенты: заполните БД.')
+    return [
+        '/api/tags/',
+        f'/api/ingredients/?name={quote(ingredient.name[:2])}',
+        f'/api/recipes/{recipe.pk}/',
+        f'/s/{recipe.get_short_code()}/',
+    ]
+
+
+def request_bytes(url):
+    return (f'GET {url} HTTP/1.1\r\nHost: localhost\r\n'
+            f'Connection: close\r\n\r\n').encode()
+
+
+async def fetch(port, url, slow=False):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    data = request_bytes(url)
+    if slow:
+        for index in range(len(data)):
+            writer.write(data[index:index + 1])
+            await writer.drain()
+            await asyncio.sleep(SLOW_BYTE_DELAY)
+    else:
+        writer.write(data)
+    await writer.drain()
+    status = await reader.readline()
+    await reader.read()
+    writer.close()
+    if not status.split()[1:2] or status.split()[1] not in (b'200', b'302'):
+        raise RuntimeError(f'{url}: {status!r}')
+
+
+async def client(port, urls, deadline, timings, slow):
+    index = 0
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        await fetch(port, urls[index % len(urls)], slow)
+        if not slow:
+            timings.append(time.perf_counter() - start)
+        index += 1
+
+
+async def load(port, urls, clients, slow, duration):
+    timings = []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        client(port, urls, deadline, timings, number < slow)
+        for number in range(clients + slow)
+    ))
+    return timings
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit('Сервер завершился при запуске.')
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit('Сервер не запустился.')
+
+
+def rss_megabytes(pid):
+    '''Память процесса и всех его потомков по /proc, в МБ.'''
+    parents = {}
+    for entry in Path('/proc').iterdir():
+        if entry.name.isdigit():
+            try:
+                status = (entry / 'status').read_text()
+            except OSError:
+                continue
+            fields = dict(
+                line.split(':', 1) for line in status.splitlines()
+                if ':' in line
+            )
+            rss = int(fields.get('VmRSS', '0 kB').split()[0])
+            parents[int(entry.name)] = (int(fields['PPid']), rss)
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += parents.get(current, (0, 0))[1]
+        stack.extend(
+            child for child, (parent, _) in parents.items()
+            if parent == current
+        )
+    return total / 1024
+
+
+def run_mode(mode, urls, args):
+    port = free_port()
+    process = subprocess.Popen(
+        ['gunicorn', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(args.workers), *MODES[mode]],
+        cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port, process)
+        asyncio.run(load(port, urls, args.clients, 0, 1))
+        timings = asyncio.run(
+            load(port, urls, args.clients, args.slow, args.duration)
+        )
+        memory = rss_megabytes(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+    print(f'{mode}: {len(timings) / args.duration:8.1f} запросов/с'
+          f'  p50 {percentile(timings, 0.5) * 1e3:7.1f} мс'
+          f'  p99 {percentile(timings, 0.99) * 1e3:7.1f} мс'
+          f'  память {memory:6.1f} МБ')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--slow', type=int, default=8,
+                        help='Клиенты, отправляющие запрос по байту.')
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+    urls = benchmark_urls()
+    for mode in MODES:
+        run_mode(mode, urls, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+'''Задержка автодополнения ингредиентов: запрос в БД против индекса.
+
+Запуск из каталога backend после migrate и загрузки data/ingredients.json:
+    python benchmarks/ingredient_autocomplete.py
+'''
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import api.constants as const  # noqa: E402
+from api.serializers import IngredientSerializer  # noqa: E402
+from recipes.models import Ingredient  # noqa: E402
+from recipes.search import ingredient_index  # noqa: E402
+
+ROUNDS = 20
+
+
+def percentile(timings, share):
+    return sorted(timings)[int(len(timings) * share) - 1]
+
+
+def measure(search, prefixes):
+    timings = []
+    for _ in range(ROUNDS):
+        for prefix in prefixes:
+            start = time.perf_counter()
+            search(prefix)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def database_search(prefix):
+    return IngredientSerializer(
+        Ingredient.objects.filter(name__istartswith=prefix), many=True
+    ).data
+
+
+def index_search(prefix):
+    return ingredient_index.search(prefix, const.INGREDIENT_SEARCH_LIMIT)
+
+
+def main():
+    names = list(Ingredient.objects.values_list('name', flat=True)[::25])
+    if not names:
+        sys.exit('Каталог ингредиентов пуст: выполните loaddata.')
+    prefixes = [name[:length] for name in names for length in (1, 2, 4)]
+    ingredient_index.search('', 1)
+    for title, search in (('БД, istartswith', database_search),
+                          ('индекс в памяти', index_search)):
+        timings = measure(search, prefixes)
+        print(f'{title:>16}: p50 {percentile(timings, 0.5) * 1e6:9.1f} мкс'
+              f'  p99 {percentile(timings, 0.99) * 1e6:9.1f} мкс')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+'''Время сериализации страницы из 100 рецептов: ModelSerializer против
+быстрого to_representation и JSONRenderer против FastJSONRenderer.
+
+Рецепты собираются в памяти вместе с подгруженными связями, поэтому
+БД не нужна и измеряется только CPU. Запуск из каталога backend:
+    python benchmarks/recipe_serialization.py
+'''
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework import serializers  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from api.renderers import FastJSONRenderer  # noqa: E402
+from api.serializers import RecipeReadSerializer  # noqa: E402
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,  # noqa
+                            Tag)
+from users.models import User  # noqa: E402
+
+PAGE_SIZE = 100
+ROUNDS = 50
+
+
+class ModelRecipeReadSerializer(RecipeReadSerializer):
+    '''Прежний путь: поля и вложенные сериализаторы DRF.'''
+
+    to_representation = serializers.ModelSerializer.to_representation
+
+
+def build_page():
+    tags = [Tag(pk=i, name=f'Тег {i}', slug=f'tag{i}') for i in range(3)]
+    ingredients = [
+        Ingredient(pk=i, name=f'Ингредиент {i}', measurement_unit='г')
+        for i in range(10)
+    ]
+    authors = [
+        User(pk=i, email=f'user{i}@foodgram.ru', username=f'user{i}',
+             first_name='Имя', last_name='Фамилия',
+             avatar=f'media/users/{i}.png')
+        for i in range(10)
+    ]
+    recipes = []
+    for pk in range(PAGE_SIZE):
+        recipe = Recipe(
+            pk=pk, author=authors[pk % len(authors)], name=f'Рецепт {pk}',
+            text='Описание рецепта. ' * 20, cooking_time=30,
+            image=f'media/recipes/{pk}.png',
+        )
+        recipe.is_favorited = pk % 3 == 0
+        recipe.is_in_shopping_cart = pk % 5 == 0
+        recipe._prefetched_objects_cache = {
+            'tags': tags[:pk % 3 + 1],
+            'recipe': [
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=100)
+                for ingredient in ingredients[:8]
+            ],
+        }
+        recipes.append(recipe)
+    return recipes
+
+
+def measure(serializer_class, renderer, recipes, context):
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        renderer.render(
+            serializer_class(recipes, many=True, context=context).data
+        )
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    recipes = build_page()
+    context = {
+        'request': Request(APIRequestFactory().get(
+            '/api/recipes/', HTTP_HOST='localhost'
+        )),
+        'subscriptions': {1, 2, 3},
+    }
+    before = ModelRecipeReadSerializer(
+        recipes, many=True, context=context
+    ).data
+    after = RecipeReadSerializer(recipes, many=True, context=context).data
+    if JSONRenderer().render(before) != FastJSONRenderer().render(after):
+        sys.exit('Ответы различаются.')
+    for title, serializer_class, renderer in (
+        ('ModelSerializer + JSONRenderer', ModelRecipeReadSerializer,
+         JSONRenderer()),
+        ('быстрый + JSONRenderer', RecipeReadSerializer, JSONRenderer()),
+        ('быстрый + FastJSONRenderer', RecipeReadSerializer,
+         FastJSONRenderer()),
+    ):
+        median = measure(serializer_class, renderer, recipes, context)
+        print(f'{title:>30}: {median * 1e3:7.2f} мс на {PAGE_SIZE} рецептов')
+
+
+if __name__ == '__main__':
+    main()
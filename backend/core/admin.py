@@ -0,0 +1,53 @@
+from django.db.models import Q
+
+import api.constants as const
+from api.pagination import CountingPaginator
+
+
+class IndexedSearchMixin:
+    '''Поиск и подсчёт в админке без полного прохода по таблице.
+
+    Вместо UPPER(поле) LIKE '%...%' по каждой строке число ищется
+    по id (search_id_fields), а строка -- по началу значения
+    в search_prefix_fields без учёта регистра, как и обычный поиск
+    админки: UPPER(поле) LIKE 'СТРОКА%' использует индекс по
+    UPPER(поле) с text_pattern_ops (для полей пользователя их создаёт
+    миграция users 0008). Подкласс может добавить свой поиск
+    в get_text_search(). Поиск общий для списка и автодополнения.
+    Количество записей считает CountingPaginator со стратегией
+    counting: по умолчанию -- с оценкой для больших таблиц без фильтров
+    и кешем до записи рецептов, избранного, корзины или подписок.
+    Админкам других моделей этот кеш не сбрасывается, поэтому они
+    задают counting = 'exact'.
+    '''
+
+    search_id_fields = ('pk',)
+    search_prefix_fields = ()
+    paginator = CountingPaginator
+    counting = 'estimated'
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            counting=self.counting,
+        )
+
+    def get_text_search(self, term):
+        return Q()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        if term.isdigit() and int(term) <= const.MAX_ID:
+            for field in self.search_id_fields:
+                condition |= Q(**{field: int(term)})
+        for field in self.search_prefix_fields:
+            condition |= Q(**{f'{field}__istartswith': term})
+        condition |= self.get_text_search(term)
+        if not condition:
+            return queryset.none(), False
+        return queryset.filter(condition), False
@@ -0,0 +1,98 @@
+'''Модели, от строк которых зависят счётчики, и поля-счётчики.
+
+Модуль не зависит от приложений. Какие столбцы нужны счётчикам,
+регистрирует recipes/counters.py (register()); об удалении строк
+модели сообщают сигналом rows_deleted, и счётчики уменьшает его
+получатель (recipes/signals.py).
+'''
+from collections import defaultdict
+
+from django.db import models, router, transaction
+from django.dispatch import Signal
+
+# Модель строки -> имена столбцов внешних ключей, от которых зависят
+# счётчики.
+COUNTED_KEYS = defaultdict(list)
+
+# Отправляется после удаления строк: sender -- модель строк, rows --
+# словари со значениями столбцов из COUNTED_KEYS[sender].
+rows_deleted = Signal()
+
+
+def register(model, attname):
+    '''Отмечает столбец model, от которого зависит счётчик.'''
+    if attname not in COUNTED_KEYS[model]:
+        COUNTED_KEYS[model].append(attname)
+
+
+class CounterFieldsMixin:
+    '''Не перезаписывает счётчики из counter_fields при save().
+
+    Счётчики меняются только через F() (см. recipes/counters.py), а
+    save() записал бы значение, прочитанное до чужих изменений. Поэтому
+    UPDATE из save() их не трогает; INSERT записывает как обычно.
+    '''
+
+    counter_fields = ()
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        values = [
+            value for value in values
+            if value[0].name not in self.counter_fields
+        ]
+        return super()._do_update(
+            base_qs, using, pk_val, values, update_fields, forced_update
+        )
+
+
+class CountedQuerySet(models.QuerySet):
+    '''QuerySet строк, от которых зависят счётчики.
+
+    Счётчики уменьшаются не в сигналах удаления, а получателем
+    rows_deleted: одним UPDATE на каждое приращение, а не на каждую
+    строку.
+    '''
+
+    def delete(self):
+        with transaction.atomic(using=self.db, savepoint=False):
+            rows = list(self.select_for_update().values(
+                'pk', *COUNTED_KEYS[self.model]
+            ))
+            deleted = super(CountedQuerySet, self.filter(
+                pk__in=[row['pk'] for row in rows]
+            )).delete()
+            rows_deleted.send(sender=self.model, rows=rows)
+        return deleted
+
+
+class CountedMixin:
+    '''Уменьшает счётчики при удалении объекта (см. CountedQuerySet).
+
+    Загруженный из базы объект помнит значения столбцов из COUNTED_KEYS
+    в counter_keys, чтобы при save() можно было перенести счётчик со
+    старой цели на новую. У созданных в памяти объектов counter_keys
+    нет, пока их не сохранят.
+    '''
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_counter_keys()
+        return instance
+
+    def remember_counter_keys(self):
+        # Берётся из __dict__, чтобы не загружать отложенные поля.
+        self.counter_keys = {
+            key: self.__dict__.get(key) for key in COUNTED_KEYS[type(self)]
+        }
+
+    def delete(self, using=None, keep_parents=False):
+        model = type(self)
+        using = using or router.db_for_write(model, instance=self)
+        row = {key: getattr(self, key) for key in COUNTED_KEYS[model]}
+        with transaction.atomic(using=using, savepoint=False):
+            deleted = super().delete(using, keep_parents)
+            if deleted[1].get(self._meta.label):
+                rows_deleted.send(sender=model, rows=[row])
+        return deleted
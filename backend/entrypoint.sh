@@ -1,5 +1,10 @@
 python manage.py makemigrations --no-input
 python manage.py migrate --no-input
 python manage.py collectstatic --no-input
-python manage.py loaddata data/ingredients.json --no-input
-gunicorn --bind 0.0.0.0:8000 backend.wsgi
\ No newline at end of file
+python manage.py load_ingredients data/ingredients.json
+python manage.py backfill_short_codes
+python manage.py generate_image_variants
+if [ "$SERVER_MODE" = "asgi" ]; then
+    exec gunicorn --bind 0.0.0.0:8000 -k uvicorn.workers.UvicornWorker backend.asgi
+fi
+exec gunicorn --bind 0.0.0.0:8000 backend.wsgi
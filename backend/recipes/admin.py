@@ -1,14 +1,29 @@
 from django.contrib import admin
+from django.db.models import Q
 from django.utils.safestring import mark_safe
 
+import api.constants as const
+from api.images import image_variants
+from core.admin import IndexedSearchMixin
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, Tag)
+from .search import trigram_search
+
+
+def name_matches(model, term):
+    '''Подзапрос id объектов, похожих на term по названию.
+
+    Триграммный поиск идёт по GIN-индексу pg_trgm (или по индексу
+    в памяти для других СУБД), а не по LIKE по всей таблице.
+    '''
+    return trigram_search(model.objects.all(), 'name', term).values('pk')
 
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredient',)
 
 
 class RecipeTagInline(admin.TabularInline):
@@ -18,12 +33,16 @@ class RecipeTagInline(admin.TabularInline):
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(IndexedSearchMixin, admin.ModelAdmin):
     '''Админка ингредиентов.'''
 
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
     search_fields = ('name',)
+    counting = 'exact'
+
+    def get_text_search(self, term):
+        return Q(pk__in=name_matches(Ingredient, term))
 
 
 @admin.register(Tag)
@@ -38,7 +57,7 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(IndexedSearchMixin, admin.ModelAdmin):
     '''Админка рецетов.'''
 
     list_display = (
@@ -48,61 +67,108 @@ class RecipeAdmin(admin.ModelAdmin):
         'author',
         'ingredients_list',
         'favorites_count',
+        'shopping_carts_count',
         'image',
     )
-    list_editable = (
-        'cooking_time',
-        'text',
-        'image',
-        'author',
-    )
+    list_editable = ('cooking_time',)
     list_display_links = ('name',)
-    list_filter = ('name',)
-    search_fields = ('name', 'author')
+    list_filter = ('tags',)
+    autocomplete_fields = ('author',)
+    search_fields = ('name', 'author__username')
+    search_prefix_fields = ('author__username', 'author__email')
     empty_value_display = '-пусто-'
 
     inlines = [RecipeIngredientInline, RecipeTagInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related('ingredients')
+
+    def get_text_search(self, term):
+        return Q(pk__in=name_matches(Recipe, term))
+
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        before = set(recipe.recipe.values_list('recipe', 'ingredient'))
+        super().save_related(request, form, formsets, change)
+        if change and any(
+            formset.model is RecipeIngredient and formset.has_changed()
+            for formset in formsets
+        ):
+            ShoppingListItem.objects.refresh_recipe_ingredients(
+                before | set(recipe.recipe.values_list('recipe', 'ingredient'))
+            )
+
     def ingredients_list(self, obj):
         return ', '.join(
             (str(ingredient) for ingredient in obj.ingredients.all())
         )
 
-    def favorites_count(self, obj):
-        return obj.recipe_favorites.count()
-
     def image(self, obj):
-        return mark_safe(f"<img src={obj.image.url} width='80' height='60'>")
+        url = image_variants(obj.image).get('jpeg', {}).get(
+            f'{const.IMAGE_VARIANT_WIDTHS[0]}w', obj.image.url
+        )
+        return mark_safe(f"<img src={url} width='80' height='60'>")
+
+
+class RecipeRelationAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    '''Общая часть админок избранного и корзины.'''
+
+    list_display = (
+        'user',
+        'recipe',
+    )
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    search_fields = ('recipe__name', 'user__username')
+    search_id_fields = ('recipe_id', 'user_id')
+    search_prefix_fields = ('user__username', 'user__email')
+    empty_value_display = '-пусто-'
+
+    def get_text_search(self, term):
+        return Q(recipe__in=name_matches(Recipe, term))
 
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientsAdmin(admin.ModelAdmin):
+class RecipeIngredientsAdmin(IndexedSearchMixin, admin.ModelAdmin):
     '''Админка ингридиентов для рецепта.'''
 
     list_display = ('recipe', 'ingredient', 'amount')
-    search_fields = ('recipe',)
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+    search_fields = ('recipe__name',)
+    search_id_fields = ('recipe_id',)
+    counting = 'exact'
     empty_value_display = '-пусто-'
 
+    def get_text_search(self, term):
+        return Q(recipe__in=name_matches(Recipe, term))
+
+    def save_model(self, request, obj, form, change):
+        rows = set(RecipeIngredient.objects.filter(
+            pk=obj.pk
+        ).values_list('recipe', 'ingredient')) if change else set()
+        super().save_model(request, obj, form, change)
+        rows.add((obj.recipe_id, obj.ingredient_id))
+        ShoppingListItem.objects.refresh_recipe_ingredients(rows)
+
+    def delete_model(self, request, obj):
+        rows = [(obj.recipe_id, obj.ingredient_id)]
+        super().delete_model(request, obj)
+        ShoppingListItem.objects.refresh_recipe_ingredients(rows)
+
+    def delete_queryset(self, request, queryset):
+        rows = list(queryset.values_list('recipe', 'ingredient'))
+        super().delete_queryset(request, queryset)
+        ShoppingListItem.objects.refresh_recipe_ingredients(rows)
+
 
 @admin.register(ShoppingCart)
-class ShoppingCartListAdmin(admin.ModelAdmin):
+class ShoppingCartListAdmin(RecipeRelationAdmin):
     '''Админка корзины.'''
 
-    list_display = (
-        'user',
-        'recipe',
-    )
-    search_fields = ('recipe',)
-    empty_value_display = '-пусто-'
-
 
 @admin.register(Favorite)
-class FavouriteAdmin(admin.ModelAdmin):
+class FavouriteAdmin(RecipeRelationAdmin):
     '''Админка избранного.'''
-
-    list_display = (
-        'user',
-        'recipe',
-    )
-    search_fields = ('recipe', 'user')
-    empty_value_display = '-пусто-'
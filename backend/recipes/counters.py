@@ -0,0 +1,163 @@
+'''Счётчики избранного, корзин, рецептов и подписок.
+
+Счётчики хранятся в Recipe и User и меняются выражением F() в той же
+транзакции, что и строка, от которой они зависят, поэтому конкурентные
+запросы не теряют изменений. Создание и изменение строк учитывают
+сигналы (см. signals.py). Удаление счётчики учитывают не в сигналах
+удаления, а в CountedQuerySet и CountedMixin (core/counted.py): одним
+UPDATE на каждое приращение, а не на каждую строку. Сами сигналы
+удаления у этих моделей есть (post_delete в api/signals.py сбрасывает
+кэш счётчиков страниц, pre/post_delete корзины в signals.py обновляет
+список покупок), поэтому Django удаляет строки через Collector, а не
+одним DELETE. Каскад от удаляемого пользователя учитывает
+count_cascade(); удаление добавлений ещё и отмечает рейтинги рецептов
+для пересчёта (см. rankings.py). bulk_create сигналов не отправляет,
+и код, который его использует, вызывает add_many() сам. Расхождения
+исправляет reconcile_counters.
+'''
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.db.models.functions import Coalesce
+
+from core.counted import register
+from users.models import Subscribe
+from .models import Favorite, Recipe, ShoppingCart
+from .rankings import SOURCES, mark_stale
+
+User = get_user_model()
+
+# (модель строки, её внешний ключ, модель со счётчиком, поле счётчика)
+COUNTERS = (
+    (Favorite, 'recipe', Recipe, 'favorites_count'),
+    (ShoppingCart, 'recipe', Recipe, 'shopping_carts_count'),
+    (Recipe, 'author', User, 'recipes_count'),
+    (Subscribe, 'author', User, 'followers_count'),
+    (Subscribe, 'subscriber', User, 'following_count'),
+)
+
+for source, key, _, _ in COUNTERS:
+    register(source, source._meta.get_field(key).attname)
+
+
+@lru_cache(maxsize=None)
+def counters_for(sender):
+    '''Тройки (внешний ключ, модель, поле счётчика) для модели строки.'''
+    return [
+        (source._meta.get_field(key), target, field)
+        for source, key, target, field in COUNTERS if source is sender
+    ]
+
+
+def add(target, field, pk, delta, loaded=None):
+    '''Прибавляет delta к счётчику; ниже нуля счётчик не опускается.
+
+    loaded -- уже загруженный объект со счётчиком: его значение
+    в памяти тоже меняется, чтобы ответ API не отставал на единицу.
+    '''
+    queryset = target.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: models.F(field) + delta})
+    if loaded is not None and loaded.pk == pk:
+        setattr(loaded, field, max(getattr(loaded, field) + delta, 0))
+
+
+def add_many(target, field, pks, sign=1):
+    '''Прибавляет (при sign=-1 вычитает) по единице за каждое вхождение
+    id в pks; ниже нуля счётчик не опускается.
+
+    Один UPDATE на каждое различное приращение, а не на каждую строку.
+    '''
+    by_delta = defaultdict(list)
+    for pk, delta in Counter(pks).items():
+        by_delta[sign * delta].append(pk)
+    for delta, group in by_delta.items():
+        queryset = target.objects.filter(pk__in=group)
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+        queryset.update(**{field: models.F(field) + delta})
+
+
+def counter_keys(source):
+    '''Имена столбцов внешних ключей source, от которых зависят счётчики.'''
+    return [key.attname for key, _, _ in counters_for(source)]
+
+
+def count_removed(source, rows):
+    '''Вычитает из счётчиков удалённые строки source.
+
+    rows -- словари со значениями столбцов из counter_keys(source).
+    '''
+    for key, target, field in counters_for(source):
+        add_many(target, field, [row[key.attname] for row in rows], sign=-1)
+    if source in SOURCES:
+        mark_stale({row['recipe_id'] for row in rows})
+
+
+def cascades(model, to):
+    '''Внешние ключи model на модель to с каскадным удалением.'''
+    return [
+        field for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model is to
+        and field.remote_field.on_delete is models.CASCADE
+    ]
+
+
+def count_cascade(instance):
+    '''Вычитает из счётчиков строки, которые удалятся каскадом с instance.
+
+    Вызывается до удаления. Цели, которые удаляются вместе с instance
+    (рецепты удаляемого автора, сам instance), не обновляются.
+    '''
+    model = type(instance)
+    for source, key, target, field in COUNTERS:
+        doomed = models.Q()
+        for fk in cascades(target, model):
+            doomed |= models.Q(**{f'{key}__{fk.name}': instance.pk})
+        for fk in cascades(source, model):
+            if fk.name == key:
+                continue
+            pks = list(source.objects.filter(
+                **{fk.name: instance.pk}
+            ).exclude(doomed).values_list(key, flat=True))
+            add_many(target, field, pks, sign=-1)
+            if source in SOURCES:
+                mark_stale(pks)
+
+
+def actual_count(source, key):
+    '''Выражение: сколько строк source ссылается на объект через key.'''
+    return Coalesce(models.Subquery(
+        source.objects.filter(
+            **{key: models.OuterRef('pk')}
+        ).order_by().values(key).annotate(
+            total=models.Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def reconcile(fix=True):
+    '''Сверяет счётчики с таблицами и при fix исправляет расхождения.
+
+    Возвращает список (модель, поле, id, было, должно быть).
+    '''
+    mismatches = []
+    for source, key, target, field in COUNTERS:
+        actual = actual_count(source, key)
+        wrong = list(target.objects.annotate(
+            actual=actual
+        ).exclude(**{field: models.F('actual')}).values_list(
+            'pk', field, 'actual'
+        ))
+        mismatches.extend(
+            (target, field, pk, stored, expected)
+            for pk, stored, expected in wrong
+        )
+        if fix and wrong:
+            target.objects.filter(
+                pk__in=[pk for pk, _, _ in wrong]
+            ).update(**{field: actual})
+    return mismatches
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.short_links import encode_short_code
+
+
+class Command(BaseCommand):
+    help = 'Записывает вычисляемые короткие коды рецептам без кода.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        recipes = Recipe.objects.filter(short_code=None).order_by('pk')
+        last_pk, updated = 0, 0
+        while True:
+            batch = [
+                Recipe(pk=pk, short_code=encode_short_code(pk))
+                for pk in recipes.filter(pk__gt=last_pk).values_list(
+                    'pk', flat=True
+                )[:batch_size]
+            ]
+            if not batch:
+                break
+            Recipe.objects.bulk_update(batch, ('short_code',))
+            updated += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Обновлено рецептов: {updated}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, обновлено рецептов: {updated}'
+        ))
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+import api.constants as const
+from recipes.ndjson import export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты в NDJSON (в файл или в stdout).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-')
+        parser.add_argument('--batch-size', type=int,
+                            default=const.IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, path, batch_size, **options):
+        lines = export_recipes(batch_size=batch_size)
+        if path == '-':
+            for line in lines:
+                sys.stdout.buffer.write(line)
+            return
+        count = 0
+        with open(path, 'wb') as file:
+            for line in lines:
+                file.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, выгружено рецептов: {count}'
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from api.images import (last_variant_name, mark_ready, render_variants,
+                        variant_targets)
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии картинок рецептов и аватаров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии, даже если они уже есть.',
+        )
+
+    def handle(self, *args, force, **options):
+        created = 0
+        for model, field in ((Recipe, 'image'), (User, 'avatar')):
+            images = model.objects.exclude(
+                **{field: ''}
+            ).exclude(**{f'{field}__isnull': True})
+            if not force:
+                images = images.exclude(
+                    **{f'{field}_variants_for': models.F(field)}
+                )
+            for instance in images.only('pk', field):
+                image = getattr(instance, field)
+                storage = image.storage
+                if not storage.exists(image.name):
+                    continue
+                # Копии, созданные до поля готовности, только отмечаются.
+                if force or not storage.exists(last_variant_name(image.name)):
+                    render_variants(*variant_targets(image))
+                    created += 1
+                mark_ready(model, instance.pk, field, image.name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, обработано картинок: {created}'
+        ))
@@ -0,0 +1,47 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+import api.constants as const
+from recipes.ndjson import RecipeImporter
+
+
+class Command(BaseCommand):
+    help = 'Загружает рецепты из NDJSON пачками через bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON или - для stdin.')
+        parser.add_argument('--batch-size', type=int,
+                            default=const.IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--source',
+            help='Имя источника для продолжения загрузки; '
+                 'по умолчанию абсолютный путь к файлу.',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Пропустить строки, загруженные прошлым запуском.',
+        )
+
+    def handle(self, *args, path, batch_size, source, resume, **options):
+        if path == '-':
+            if resume and not source:
+                raise CommandError('Для stdin с --resume нужен --source.')
+            lines = sys.stdin.buffer
+        else:
+            source = source or os.path.abspath(path)
+            lines = open(path, 'rb')
+        importer = RecipeImporter(batch_size=batch_size, source=source)
+        try:
+            importer.run(lines, resume=resume)
+        finally:
+            if lines is not sys.stdin.buffer:
+                lines.close()
+        for error in importer.errors:
+            self.stderr.write(f'Строка {error["line"]}: {error["error"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: загружено {importer.created}, '
+            f'пропущено {importer.skipped}, '
+            f'ошибок {importer.error_count}'
+        ))
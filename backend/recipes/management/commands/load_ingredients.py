@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+import api.constants as const
+from recipes.models import ImportProgress, Ingredient
+from recipes.search import CachedIndex
+
+
+def ingredient_key(name, measurement_unit):
+    '''Ключ сравнения: название и единица без учёта регистра и пробелов.'''
+    return name.strip().lower(), measurement_unit.strip().lower()
+
+
+class Command(BaseCommand):
+    help = ('Загружает справочник ингредиентов, если файл изменился '
+            'с прошлой загрузки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?',
+                            default='data/ingredients.json')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Загрузить, даже если контрольная сумма не изменилась.',
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Удалить ингредиенты, которых нет в файле '
+                 'и которые не используются в рецептах и списках покупок.',
+        )
+
+    def read(self, content):
+        '''Пары (название, единица) из фикстуры или простого списка.'''
+        try:
+            items = json.loads(content)
+            catalog = {}
+            for item in items:
+                fields = item.get('fields', item)
+                name = fields['name'].strip()
+                unit = fields['measurement_unit'].strip()
+                catalog.setdefault(ingredient_key(name, unit), (name, unit))
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            raise CommandError(f'Неверный файл ингредиентов: {error}')
+        return catalog
+
+    def handle(self, *args, path, force, prune, **options):
+        try:
+            with open(path, 'rb') as file:
+                content = file.read()
+        except OSError as error:
+            raise CommandError(error)
+        source = f'ingredients:{os.path.abspath(path)}'
+        checksum = hashlib.sha256(content).hexdigest()
+        if not force and ImportProgress.objects.filter(
+            source=source, checksum=checksum
+        ).exists():
+            self.stdout.write('Справочник ингредиентов не изменился.')
+            return
+        catalog = self.read(content)
+        existing, changed = {}, []
+        for ingredient in Ingredient.objects.order_by('pk'):
+            key = ingredient_key(ingredient.name,
+                                 ingredient.measurement_unit)
+            if key in existing:
+                continue
+            existing[key] = ingredient
+            if key in catalog and catalog[key] != (
+                ingredient.name, ingredient.measurement_unit
+            ):
+                ingredient.name, ingredient.measurement_unit = catalog[key]
+                changed.append(ingredient)
+        added = [
+            Ingredient(name=name, measurement_unit=unit)
+            for key, (name, unit) in catalog.items() if key not in existing
+        ]
+        stale = [
+            ingredient.pk for key, ingredient in existing.items()
+            if key not in catalog
+        ]
+        removed = 0
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                added, batch_size=const.IMPORT_BATCH_SIZE
+            )
+            Ingredient.objects.bulk_update(
+                changed, ('name', 'measurement_unit'),
+                batch_size=const.IMPORT_BATCH_SIZE,
+            )
+            if prune and stale:
+                _, deleted = Ingredient.objects.filter(
+                    pk__in=stale, ingredients__isnull=True,
+                    shopping_list_items__isnull=True,
+                ).delete()
+                removed = deleted.get(Ingredient._meta.label, 0)
+            ImportProgress.objects.update_or_create(
+                source=source, defaults={'checksum': checksum}
+            )
+        if added or changed or removed:
+            CachedIndex.invalidate(Ingredient._meta.label)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: добавлено {len(added)}, изменено {len(changed)}, '
+            f'удалено {removed}, нет в файле {len(stale) - removed}'
+        ))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingCart, ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает или сверяет списки покупок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сверить списки с корзинами, ничего не меняя.',
+        )
+
+    def user_batches(self, batch_size):
+        '''Пачки id пользователей с корзиной или списком покупок.'''
+        users = sorted(
+            set(ShoppingCart.objects.values_list('user_id', flat=True))
+            | set(ShoppingListItem.objects.values_list('user_id', flat=True))
+        )
+        for start in range(0, len(users), batch_size):
+            yield users[start:start + batch_size]
+
+    def verify(self, users):
+        stored = {
+            (row['user'], row['ingredient']): row['amount']
+            for row in ShoppingListItem.objects.filter(
+                user__in=users
+            ).values('user', 'ingredient', 'amount')
+        }
+        expected = {
+            (row['user'], row['ingredient']): row['total']
+            for row in ShoppingListItem.objects.expected(users)
+        }
+        mismatches = 0
+        for user, ingredient in sorted(stored.keys() | expected.keys()):
+            amount = stored.get((user, ingredient))
+            total = expected.get((user, ingredient))
+            if amount != total:
+                mismatches += 1
+                self.stdout.write(
+                    f'Пользователь {user}, ингредиент {ingredient}: '
+                    f'в списке {amount}, в корзине {total}'
+                )
+        return mismatches
+
+    def handle(self, *args, batch_size, verify, **options):
+        processed, mismatches = 0, 0
+        for users in self.user_batches(batch_size):
+            if verify:
+                mismatches += self.verify(users)
+            else:
+                ShoppingListItem.objects.refresh(users)
+            processed += len(users)
+            self.stdout.write(f'Обработано пользователей: {processed}')
+        if mismatches:
+            raise CommandError(f'Расхождений в списках покупок: {mismatches}')
+        self.stdout.write(self.style.SUCCESS(
+            'Списки покупок совпадают с корзинами.' if verify
+            else f'Готово, пересобрано списков: {processed}'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики избранного, корзин, рецептов и подписок '
+            'с таблицами и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сверить счётчики, ничего не меняя.',
+        )
+
+    def handle(self, *args, verify, **options):
+        mismatches = reconcile(fix=not verify)
+        for model, field, pk, stored, actual in mismatches:
+            self.stdout.write(
+                f'{model._meta.label} {pk}, {field}: '
+                f'записано {stored}, на самом деле {actual}'
+            )
+        if verify and mismatches:
+            raise CommandError(f'Расхождений в счётчиках: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: {len(mismatches)}' if mismatches
+            else 'Счётчики совпадают с таблицами.'
+        ))
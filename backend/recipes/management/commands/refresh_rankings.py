@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+
+import api.constants as const
+from recipes.rankings import refresh
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинги рецептов за сутки, неделю '
+            'и всё время.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period', action='append', choices=const.RANKING_WINDOWS,
+            help='Пересчитать только этот период (можно повторять).',
+        )
+        parser.add_argument(
+            '--every', type=int, nargs='?', metavar='SECONDS',
+            const=const.RANKING_REFRESH_EVERY,
+            help=('Не завершаться, а пересчитывать раз в SECONDS секунд '
+                  f'(по умолчанию {const.RANKING_REFRESH_EVERY}).'),
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рецепты, а не только изменившиеся.',
+        )
+
+    def handle(self, *args, period, every, full, **options):
+        while True:
+            # Соединение, оборванное перезапуском БД, не переживёт цикл.
+            close_old_connections()
+            try:
+                for name, changed in refresh(period, full=full).items():
+                    self.stdout.write(f'{name}: изменено строк {changed}')
+            except DatabaseError as error:
+                if not every:
+                    raise
+                self.stderr.write(f'Рейтинги не пересчитаны: {error}')
+            if not every:
+                break
+            time.sleep(every)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые векторы рецептов пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Только рецепты без поискового вектора.',
+        )
+
+    def handle(self, *args, batch_size, missing, **options):
+        recipes = Recipe.objects.order_by('pk')
+        if connections[recipes.db].vendor != 'postgresql':
+            self.stderr.write(self.style.WARNING(
+                'Полнотекстовый поиск доступен только в PostgreSQL.'
+            ))
+            return
+        if missing:
+            recipes = recipes.filter(search_vector__isnull=True)
+        last_pk, updated = 0, 0
+        while True:
+            batch = list(recipes.filter(pk__gt=last_pk).values_list(
+                'pk', flat=True
+            )[:batch_size])
+            if not batch:
+                break
+            updated += Recipe.objects.filter(
+                pk__in=batch
+            ).update_search_vector()
+            last_pk = batch[-1]
+            self.stdout.write(f'Обновлено рецептов: {updated}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, обновлено рецептов: {updated}'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0029_import_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importprogress',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Контрольная сумма'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:48
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'Favorite', 'recipe', 'recipes', 'Recipe', 'favorites_count'),
+    ('recipes', 'ShoppingCart', 'recipe',
+     'recipes', 'Recipe', 'shopping_carts_count'),
+    ('recipes', 'Recipe', 'author', 'users', 'User', 'recipes_count'),
+    ('users', 'Subscribe', 'author', 'users', 'User', 'followers_count'),
+    ('users', 'Subscribe', 'subscriber', 'users', 'User', 'following_count'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app, model, key, target_app, target, field in COUNTERS:
+        source = apps.get_model(app, model)
+        apps.get_model(target_app, target).objects.update(**{
+            field: Coalesce(models.Subquery(
+                source.objects.filter(
+                    **{key: models.OuterRef('pk')}
+                ).order_by().values(key).annotate(
+                    total=models.Count('pk')
+                ).values('total')
+            ), 0)
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0030_import_progress_checksum'),
+        ('users', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
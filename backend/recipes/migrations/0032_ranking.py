@@ -0,0 +1,62 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def fill_created(apps, schema_editor):
+    '''Старым строкам -- дата публикации рецепта, а не время миграции,
+    иначе все они попадут в рейтинг «за сутки».'''
+    for name in ('Favorite', 'ShoppingCart'):
+        apps.get_model('recipes', name).objects.update(
+            created=models.Subquery(
+                apps.get_model('recipes', 'Recipe').objects.filter(
+                    pk=models.OuterRef('recipe')
+                ).values('pub_date')
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0031_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Добавлено'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Добавлено'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_created, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='RecipeRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'За сутки'), ('week', 'За неделю'), ('all', 'За всё время')], max_length=8, verbose_name='Период')),
+                ('score', models.PositiveIntegerField(verbose_name='Очки')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['period', '-score', '-recipe'], name='recipe_ranking_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reciperanking',
+            constraint=models.UniqueConstraint(fields=('period', 'recipe'), name='recipe_ranking_unique'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0032_ranking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reciperanking',
+            name='stale',
+            field=models.BooleanField(default=False, verbose_name='Требует пересчёта'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(condition=models.Q(('stale', True)), fields=['period'], name='recipe_ranking_stale_idx'),
+        ),
+        migrations.CreateModel(
+            name='RankingProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'За сутки'), ('week', 'За неделю'), ('all', 'За всё время')], max_length=8, unique=True, verbose_name='Период')),
+                ('created_until', models.DateTimeField(verbose_name='Учтены добавления до')),
+            ],
+            options={
+                'verbose_name': 'Прогресс рейтинга',
+                'verbose_name_plural': 'Прогресс рейтингов',
+            },
+        ),
+    ]
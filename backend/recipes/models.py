@@ -1,11 +1,16 @@
-import random
-import string
+from collections import defaultdict
 
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import RowNumber
 
 import api.constants as const
+from core.counted import CountedMixin, CountedQuerySet, CounterFieldsMixin
+from .short_links import encode_short_code
 
 User = get_user_model()
 
@@ -45,7 +50,96 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(CountedQuerySet):
+
+    def with_user_flags(self, user):
+        '''Добавляет флаги is_favorited и is_in_shopping_cart.'''
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+        )
+
+    def with_related(self):
+        '''Подгружает автора, теги и ингредиенты для списка рецептов.'''
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('ingredient__name'),
+            ),
+        )
+
+    def latest_per_author(self, authors, limit):
+        '''Не больше limit последних рецептов каждого автора.
+
+        Нумерует рецепты внутри автора через ROW_NUMBER() и отбирает
+        нужные одним запросом на всю страницу авторов.
+        '''
+        ranked = self.filter(author__in=authors).annotate(
+            author_position=Window(
+                expression=RowNumber(),
+                partition_by=models.F('author'),
+                order_by=(models.F('pub_date').desc(),
+                          models.F('pk').desc()),
+            )
+        ).values('pk', 'author_position')
+        sql, params = ranked.query.sql_with_params()
+        quote_name = connections[self.db].ops.quote_name
+        return self.filter(pk__in=RawSQL(
+            f'SELECT {quote_name("id")} FROM ({sql}) ranked '
+            f'WHERE {quote_name("author_position")} <= %s',
+            (*params, limit),
+        ))
+
+    def update_search_vector(self):
+        '''Пересчитывает поисковый вектор (только PostgreSQL).'''
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=const.SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=const.SEARCH_CONFIG)
+        ))
+
+    def full_text_search(self, query):
+        '''Полнотекстовый поиск по названию и описанию (поле rank).'''
+        if connections[self.db].vendor == 'postgresql':
+            search_query = SearchQuery(
+                query, config=const.SEARCH_CONFIG, search_type='websearch'
+            )
+            return self.filter(search_vector=search_query).annotate(
+                rank=SearchRank(models.F('search_vector'), search_query)
+            ).order_by('-rank', '-pub_date', '-id')
+        return self.filter(
+            models.Q(name__icontains=query) | models.Q(text__icontains=query)
+        ).annotate(
+            rank=models.Case(
+                models.When(name__icontains=query, then=models.Value(1.0)),
+                default=models.Value(0.5),
+                output_field=models.FloatField(),
+            )
+        ).order_by('-rank', '-pub_date', '-id')
+
+
+class Recipe(CountedMixin, CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -55,6 +149,10 @@ class Recipe(models.Model):
     name = models.CharField('Название', max_length=const.RECIPE_CHAR_LEN)
     image = models.ImageField('Картинка', upload_to='media/recipes/',
                               blank=True)
+    image_variants_for = models.CharField(
+        'Копии созданы для картинки', max_length=100, blank=True,
+        editable=False,
+    )
     text = models.TextField('Описание')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -73,27 +171,33 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
     short_code = models.CharField(max_length=const.CODE_MAX_LEN,
                                   blank=True, null=True, unique=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        'В корзинах', default=0, editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'shopping_carts_count')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id_idx'),
+        )
 
-    @staticmethod
-    def generate_short_code(length=6):
-        return ''.join(random.choices(string.ascii_letters
-                                      + string.digits, k=length))
-
-    def generate_unique_short_code(self):
-        while True:
-            code = self.generate_short_code()
-            if not Recipe.objects.filter(short_code=code).exists():
-                return code
-
-    def save(self, *args, **kwargs):
-        if not self.short_code:
-            self.short_code = self.generate_unique_short_code()
-        super().save(*args, **kwargs)
+    def get_short_code(self):
+        '''Сохранённый код или код, вычисленный из id.'''
+        if self.short_code:
+            return self.short_code
+        if self.pk is None:
+            return None
+        return encode_short_code(self.pk)
 
     def __str__(self):
         return self.name
@@ -135,7 +239,7 @@ class RecipeIngredient(models.Model):
         return f'{self.recipe} - {self.ingredient}, {self.amount}'
 
 
-class Favorite(models.Model):
+class Favorite(CountedMixin, models.Model):
     '''Модель для избранных рецептов.'''
 
     user = models.ForeignKey(
@@ -150,6 +254,10 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='recipe_favorites',
     )
+    created = models.DateTimeField('Добавлено', auto_now_add=True,
+                                   db_index=True)
+
+    objects = CountedQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Избранный рецепт'
@@ -168,7 +276,7 @@ class Favorite(models.Model):
         return f'{self.user} добавил {self.recipe} в избранное'
 
 
-class ShoppingCart(models.Model):
+class ShoppingCart(CountedMixin, models.Model):
     '''Модель рецептов в корзине.'''
 
     user = models.ForeignKey(
@@ -183,6 +291,10 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='shopping_recipe',
     )
+    created = models.DateTimeField('Добавлено', auto_now_add=True,
+                                   db_index=True)
+
+    objects = CountedQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Корзина'
@@ -199,3 +311,184 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в корзину'
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+
+    def expected(self, users=None, ingredients=None):
+        '''Суммы ингредиентов по корзинам, посчитанные заново.'''
+        # Условия на корзину задаются одним filter(), иначе Django
+        # присоединит таблицу корзины повторно и суммы задвоятся.
+        lookups = {'recipe__shopping_recipe__isnull': False}
+        if users is not None:
+            lookups['recipe__shopping_recipe__user__in'] = users
+        if ingredients is not None:
+            lookups['ingredient__in'] = ingredients
+        totals = RecipeIngredient.objects.filter(**lookups).order_by()
+        return totals.values(
+            'ingredient', user=models.F('recipe__shopping_recipe__user'),
+        ).annotate(total=models.Sum('amount'))
+
+    def refresh(self, users, ingredients=None):
+        '''Пересчитывает строки списка покупок пользователей users.
+
+        Если задан ingredients, пересчитываются только эти ингредиенты.
+        Строки пользователей блокируются (в порядке id, чтобы не было
+        взаимных блокировок): параллельные изменения корзины одного
+        пользователя пересчитываются по очереди, и второй пересчёт
+        видит закоммиченные строки первого, а не падает на уникальном
+        индексе (user, ingredient).
+        '''
+        if not isinstance(users, models.QuerySet):
+            users = [getattr(user, 'pk', user) for user in users]
+        with transaction.atomic(using=self.db):
+            users = list(User.objects.using(self.db).select_for_update(
+            ).filter(pk__in=users).order_by('pk').values_list(
+                'pk', flat=True
+            ))
+            items = self.filter(user__in=users)
+            if ingredients is not None:
+                items = items.filter(ingredient__in=ingredients)
+            items.delete()
+            self.bulk_create(
+                self.model(user_id=row['user'],
+                           ingredient_id=row['ingredient'],
+                           amount=row['total'])
+                for row in self.expected(users, ingredients)
+            )
+
+    def refresh_recipe(self, recipe, ingredients):
+        '''Пересчитывает списки всех, у кого рецепт лежит в корзине.'''
+        users = ShoppingCart.objects.filter(recipe=recipe).values('user')
+        self.refresh(users, ingredients)
+
+    def refresh_recipe_ingredients(self, rows):
+        '''Пересчитывает списки после записи строк состава рецептов.
+
+        rows -- пары (id рецепта, id ингредиента) до и после записи.
+        '''
+        by_recipe = defaultdict(set)
+        for recipe, ingredient in rows:
+            by_recipe[recipe].add(ingredient)
+        for recipe, ingredients in by_recipe.items():
+            self.refresh_recipe(recipe, ingredients)
+
+
+class ShoppingListItem(models.Model):
+    '''Суммарное количество ингредиента в корзине пользователя.
+
+    При изменении корзины таблицу обновляют сигналы, при изменении
+    состава рецептов -- явный вызов refresh_recipe() после записи
+    (API и админка); пересобрать её можно командой rebuild_shopping_lists.
+    '''
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='shopping_list_item_unique'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.amount}'
+
+
+class RecipeRanking(models.Model):
+    '''Очки рецепта в рейтинге за период.
+
+    Очки -- сколько раз рецепт добавили в избранное и в корзину
+    за период. Таблицу заполняет refresh_rankings (см. rankings.py),
+    списки рецептов только читают её. stale отмечает строки, у рецепта
+    которых удалили добавление: их очки пересчитает следующий refresh.
+    '''
+
+    PERIODS = (
+        ('day', 'За сутки'),
+        ('week', 'За неделю'),
+        ('all', 'За всё время'),
+    )
+
+    period = models.CharField('Период', max_length=const.RANKING_PERIOD_LEN,
+                              choices=PERIODS)
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='rankings',
+    )
+    score = models.PositiveIntegerField('Очки')
+    stale = models.BooleanField('Требует пересчёта', default=False)
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('period', 'recipe'), name='recipe_ranking_unique'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('period', '-score', '-recipe'),
+                         name='recipe_ranking_score_idx'),
+            models.Index(fields=('period',), name='recipe_ranking_stale_idx',
+                         condition=models.Q(stale=True)),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id} ({self.period}): {self.score}'
+
+
+class RankingProgress(models.Model):
+    '''До какого момента refresh_rankings учёл добавления за период.'''
+
+    period = models.CharField('Период', max_length=const.RANKING_PERIOD_LEN,
+                              choices=RecipeRanking.PERIODS, unique=True)
+    created_until = models.DateTimeField('Учтены добавления до')
+
+    class Meta:
+        verbose_name = 'Прогресс рейтинга'
+        verbose_name_plural = 'Прогресс рейтингов'
+
+    def __str__(self):
+        return f'{self.period}: {self.created_until}'
+
+
+class ImportProgress(models.Model):
+    '''Состояние загрузки из источника: импорта рецептов или справочника.
+
+    Для импорта рецептов хранится число загруженных строк,
+    для справочника ингредиентов -- контрольная сумма файла.
+    '''
+
+    source = models.CharField('Источник', max_length=const.IMPORT_SOURCE_LEN,
+                              unique=True)
+    position = models.PositiveBigIntegerField('Загружено строк', default=0)
+    checksum = models.CharField('Контрольная сумма',
+                                max_length=const.CHECKSUM_LEN, blank=True)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Прогресс импорта'
+        verbose_name_plural = 'Прогресс импорта'
+
+    def __str__(self):
+        return f'{self.source}: {self.position}'
@@ -0,0 +1,255 @@
+'''Потоковый импорт и экспорт рецептов в NDJSON.
+
+Одна строка -- один рецепт:
+{"author": "username", "name": ..., "text": ..., "cooking_time": 10,
+ "pub_date": "2024-08-15T00:00:00+00:00", "image": "media/recipes/x.png",
+ "tags": ["breakfast"], "ingredients": [{"name": "мука",
+ "measurement_unit": "г", "amount": 200}]}
+
+Автор, теги и ингредиенты задаются ссылками (username, slug, название
+с единицей измерения), картинка -- именем файла в хранилище. Импорт
+идёт пачками: рецепты, строки тегов и ингредиентов создаются через
+bulk_create в одной транзакции на пачку, вместе с номером последней
+загруженной строки. Поэтому после сбоя загрузку можно продолжить
+с того же места без дублей.
+'''
+import json
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+
+import api.constants as const
+from api.pagination import invalidate_counts
+from .counters import add_many
+from .models import (ImportProgress, Ingredient, Recipe, RecipeIngredient,
+                     Tag)
+from .search import CachedIndex
+from .short_links import store_short_codes
+
+User = get_user_model()
+
+
+def export_recipes(queryset=None, batch_size=const.IMPORT_BATCH_SIZE):
+    '''Строки NDJSON (bytes) по рецептам queryset в порядке id.'''
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    last_pk = 0
+    while True:
+        recipes = list(queryset.filter(pk__gt=last_pk).order_by('pk').values(
+            'pk', 'author__username', 'name', 'text', 'cooking_time',
+            'pub_date', 'image',
+        )[:batch_size])
+        if not recipes:
+            return
+        pks = [recipe['pk'] for recipe in recipes]
+        tags = defaultdict(list)
+        for recipe_id, slug in Recipe.tags.through.objects.filter(
+            recipe_id__in=pks
+        ).order_by('pk').values_list('recipe_id', 'tag__slug'):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=pks
+        ).order_by('pk').values_list(
+            'recipe_id', 'ingredient__name', 'ingredient__measurement_unit',
+            'amount',
+        ):
+            ingredients[recipe_id].append(
+                {'name': name, 'measurement_unit': unit, 'amount': amount}
+            )
+        for recipe in recipes:
+            yield json.dumps({
+                'id': recipe['pk'],
+                'author': recipe['author__username'],
+                'name': recipe['name'],
+                'text': recipe['text'],
+                'cooking_time': recipe['cooking_time'],
+                'pub_date': recipe['pub_date'].isoformat(),
+                'image': recipe['image'] or None,
+                'tags': tags[recipe['pk']],
+                'ingredients': ingredients[recipe['pk']],
+            }, ensure_ascii=False).encode() + b'\n'
+        last_pk = pks[-1]
+
+
+class RecipeImporter:
+    '''Загрузка рецептов из строк NDJSON пачками по batch_size.
+
+    Если задан source, номер последней загруженной строки хранится
+    в ImportProgress, и run(resume=True) пропускает загруженные строки.
+    Ошибочные строки пропускаются и попадают в errors.
+    '''
+
+    def __init__(self, batch_size=const.IMPORT_BATCH_SIZE, source=None):
+        self.batch_size = batch_size
+        self.source = source
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+        self.error_count = 0
+
+    def run(self, lines, resume=False):
+        position = 0
+        if resume and self.source:
+            position = ImportProgress.objects.filter(
+                source=self.source
+            ).values_list('position', flat=True).first() or 0
+        self.tags = dict(Tag.objects.values_list('slug', 'pk'))
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('pk', 'name', 'measurement_unit')
+        }
+        chunk = []
+        for number, line in enumerate(lines, 1):
+            if number <= position:
+                self.skipped += 1
+                continue
+            chunk.append((number, line))
+            if len(chunk) >= self.batch_size:
+                self.load(chunk)
+                chunk = []
+        if chunk:
+            self.load(chunk)
+        if self.created:
+            invalidate_counts()
+            CachedIndex.invalidate(Recipe._meta.label)
+        return self
+
+    def add_error(self, number, message):
+        self.error_count += 1
+        if len(self.errors) < const.IMPORT_ERRORS_MAX:
+            self.errors.append({'line': number, 'error': message})
+
+    def parse(self, chunk):
+        parsed = []
+        for number, line in chunk:
+            try:
+                if isinstance(line, bytes):
+                    line = line.decode()
+            except UnicodeDecodeError as error:
+                self.add_error(number, f'Неверная кодировка UTF-8: {error}')
+                continue
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                if not isinstance(data, dict):
+                    raise ValueError('ожидается JSON-объект')
+            except ValueError as error:
+                self.add_error(number, f'Неверный JSON: {error}')
+                continue
+            parsed.append((number, data))
+        return parsed
+
+    def build(self, data, authors):
+        '''Рецепт, id тегов и пары (id ингредиента, количество).'''
+        author = authors.get(data['author'])
+        if author is None:
+            raise ValueError(f'нет пользователя {data["author"]}')
+        cooking_time = int(data['cooking_time'])
+        if not (const.MIN_LEN_VALIDATOR <= cooking_time
+                <= const.MAX_LEN_VALIDATOR):
+            raise ValueError('неверное время приготовления')
+        pub_date = None
+        if data.get('pub_date'):
+            pub_date = parse_datetime(data['pub_date'])
+            if pub_date is None:
+                raise ValueError('неверная дата публикации')
+        tags = []
+        for slug in data.get('tags', ()):
+            if slug not in self.tags:
+                raise ValueError(f'нет тега {slug}')
+            tags.append(self.tags[slug])
+        ingredients = {}
+        for item in data['ingredients']:
+            key = (item['name'], item['measurement_unit'])
+            if key not in self.ingredients:
+                raise ValueError(f'нет ингредиента {key[0]}, {key[1]}')
+            amount = int(item['amount'])
+            if not (const.MIN_LEN_VALIDATOR <= amount
+                    <= const.MAX_LEN_VALIDATOR):
+                raise ValueError(f'неверное количество {key[0]}')
+            ingredients[self.ingredients[key]] = amount
+        if not tags or not ingredients:
+            raise ValueError('нужны теги и ингредиенты')
+        name = str(data['name'])
+        if len(name) > const.RECIPE_CHAR_LEN:
+            raise ValueError(
+                f'название длиннее {const.RECIPE_CHAR_LEN} символов'
+            )
+        recipe = Recipe(
+            author_id=author, name=name,
+            text=str(data['text']), cooking_time=cooking_time,
+            image=data.get('image') or '',
+        )
+        return recipe, pub_date, set(tags), ingredients
+
+    def insert(self, recipes):
+        features = connections[Recipe.objects.db].features
+        if features.can_return_rows_from_bulk_insert:
+            # bulk_create не отправляет сигналы, счётчики меняются здесь.
+            add_many(User, 'recipes_count',
+                     [recipe.author_id for recipe in recipes])
+            Recipe.objects.bulk_create(recipes)
+            store_short_codes(recipes)
+            return recipes
+        # Без RETURNING в bulk_create id новых строк неизвестны.
+        # Коды пишутся одним bulk_update после вставки всех рецептов.
+        for recipe in recipes:
+            recipe.defer_short_code = True
+            recipe.save()
+        store_short_codes(recipes)
+        return recipes
+
+    def load(self, chunk):
+        parsed = self.parse(chunk)
+        authors = dict(User.objects.filter(
+            username__in={str(data.get('author')) for _, data in parsed}
+        ).values_list('username', 'pk'))
+        items = []
+        for number, data in parsed:
+            try:
+                items.append(self.build(data, authors))
+            except (KeyError, TypeError, ValueError) as error:
+                self.add_error(number, f'Ошибка в рецепте: {error}')
+        with transaction.atomic():
+            recipes = self.insert([item[0] for item in items])
+            dated = []
+            for recipe, (_, pub_date, _, _) in zip(recipes, items):
+                if pub_date is not None:
+                    recipe.pub_date = pub_date
+                    dated.append(recipe)
+            Recipe.objects.bulk_update(dated, ('pub_date',),
+                                       batch_size=self.batch_size)
+            Recipe.tags.through.objects.bulk_create(
+                (Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag)
+                 for recipe, (_, _, tags, _) in zip(recipes, items)
+                 for tag in tags),
+                batch_size=self.batch_size,
+            )
+            RecipeIngredient.objects.bulk_create(
+                (RecipeIngredient(recipe_id=recipe.pk, ingredient_id=pk,
+                                  amount=amount)
+                 for recipe, (_, _, _, ingredients) in zip(recipes, items)
+                 for pk, amount in ingredients.items()),
+                batch_size=self.batch_size,
+            )
+            Recipe.objects.filter(
+                pk__in=[recipe.pk for recipe in recipes]
+            ).update_search_vector()
+            if self.source:
+                ImportProgress.objects.update_or_create(
+                    source=self.source, defaults={'position': chunk[-1][0]}
+                )
+        self.created += len(recipes)
+
+    @property
+    def summary(self):
+        return {
+            'created': self.created,
+            'skipped': self.skipped,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
@@ -0,0 +1,195 @@
+'''Рейтинги рецептов: популярные за всё время и набирающие популярность.
+
+Очки рецепта за период -- сколько раз его добавили в избранное
+и в корзину за последние сутки, неделю или за всё время. Они хранятся
+в RecipeRanking, и список рецептов сортируется по этой таблице без
+GROUP BY на каждый запрос.
+
+refresh() пересчитывает таблицу инкрементально. RankingProgress хранит,
+до какого момента учтены добавления (по created), и при следующем
+запуске пересчитываются только рецепты, у которых с тех пор появились
+добавления, чьи добавления вышли из окна периода или у которых
+добавления удаляли (строки RecipeRanking со stale, их отмечает
+mark_stale() при удалении). Очки этих рецептов считаются точно:
+окна -- по строкам за период, всё время -- по счётчикам
+favorites_count и shopping_carts_count. Первый запуск и refresh(full=True)
+пересчитывают всю таблицу.
+'''
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.utils import timezone
+
+import api.constants as const
+from .models import (Favorite, RankingProgress, Recipe, RecipeRanking,
+                     ShoppingCart)
+
+# Строки, из которых складываются очки рецепта.
+SOURCES = (Favorite, ShoppingCart)
+
+
+def window_scores(since, **filters):
+    '''Очки рецептов за активность начиная с since: {id: очки}.'''
+    scores = {}
+    for model in SOURCES:
+        for recipe_id, total in model.objects.filter(
+            created__gte=since, **filters
+        ).order_by().values('recipe').annotate(
+            total=models.Count('pk')
+        ).values_list('recipe', 'total'):
+            scores[recipe_id] = scores.get(recipe_id, 0) + total
+    return scores
+
+
+def total_scores(**filters):
+    '''Очки за всё время рецептов, отобранных filters, по счётчикам.'''
+    return dict(Recipe.objects.filter(**filters).annotate(
+        score=models.F('favorites_count') + models.F('shopping_carts_count')
+    ).filter(score__gt=0).order_by().values_list('pk', 'score'))
+
+
+def scores_for(period, now, **filters):
+    days = const.RANKING_WINDOWS[period]
+    if days is None:
+        return total_scores(**filters)
+    return window_scores(
+        now - timedelta(days=days),
+        **{f'recipe__{lookup}': value for lookup, value in filters.items()}
+    )
+
+
+def apply(period, scores, stored):
+    '''Приводит строки периода к scores; stored -- текущие строки.
+
+    Возвращает число изменённых строк.
+    '''
+    removed = [pk for pk in stored if pk not in scores]
+    changed = [
+        RecipeRanking(pk=stored[recipe_id][0], score=score)
+        for recipe_id, score in scores.items()
+        if recipe_id in stored and stored[recipe_id][1] != score
+    ]
+    added = [
+        RecipeRanking(period=period, recipe_id=recipe_id, score=score)
+        for recipe_id, score in scores.items() if recipe_id not in stored
+    ]
+    RecipeRanking.objects.filter(
+        period=period, recipe__in=removed
+    ).delete()
+    RecipeRanking.objects.bulk_update(
+        changed, ('score',), batch_size=const.RANKING_BATCH_SIZE
+    )
+    RecipeRanking.objects.bulk_create(
+        added, batch_size=const.RANKING_BATCH_SIZE
+    )
+    return len(removed) + len(changed) + len(added)
+
+
+def stored_rows(period, **filters):
+    return {
+        recipe_id: (pk, score)
+        for pk, recipe_id, score in RecipeRanking.objects.filter(
+            period=period, **filters
+        ).values_list('pk', 'recipe', 'score')
+    }
+
+
+def rebuild(period, now):
+    '''Пересчитывает все строки периода пачками по id рецепта.'''
+    RecipeRanking.objects.filter(period=period, stale=True).update(
+        stale=False
+    )
+    changed, start = 0, 0
+    last = Recipe.objects.aggregate(last=models.Max('pk'))['last'] or 0
+    while start <= last:
+        stop = start + const.RANKING_BATCH_SIZE
+        with transaction.atomic():
+            changed += apply(
+                period, scores_for(period, now, pk__gte=start, pk__lt=stop),
+                stored_rows(period, recipe__gte=start, recipe__lt=stop),
+            )
+        start = stop
+    return changed
+
+
+def added_between(start, stop):
+    '''id рецептов с добавлениями, у которых created в (start, stop].'''
+    recipes = set()
+    for model in SOURCES:
+        recipes.update(model.objects.filter(
+            created__gt=start, created__lte=stop
+        ).values_list('recipe', flat=True).distinct())
+    return recipes
+
+
+def changed_recipes(period, since, now):
+    '''id рецептов, чьи очки за период могли измениться после since.'''
+    recipes = added_between(since, now)
+    days = const.RANKING_WINDOWS[period]
+    if days is not None:
+        recipes.update(added_between(
+            since - timedelta(days=days), now - timedelta(days=days)
+        ))
+    stale = RecipeRanking.objects.filter(period=period, stale=True)
+    recipes.update(stale.values_list('recipe', flat=True))
+    # Снимается до подсчёта: удаление после него отметит строку снова.
+    stale.update(stale=False)
+    return sorted(recipes)
+
+
+def refresh_period(period, now, full=False):
+    progress = RankingProgress.objects.filter(period=period).first()
+    if progress is None or full:
+        changed = rebuild(period, now)
+    else:
+        changed = 0
+        recipes = changed_recipes(
+            period,
+            progress.created_until
+            - timedelta(seconds=const.RANKING_CREATED_LAG),
+            now,
+        )
+        for start in range(0, len(recipes), const.RANKING_BATCH_SIZE):
+            batch = recipes[start:start + const.RANKING_BATCH_SIZE]
+            with transaction.atomic():
+                changed += apply(
+                    period, scores_for(period, now, pk__in=batch),
+                    stored_rows(period, recipe__in=batch),
+                )
+    RankingProgress.objects.update_or_create(
+        period=period, defaults={'created_until': now}
+    )
+    return changed
+
+
+def refresh(periods=None, now=None, full=False):
+    '''Пересчитывает рейтинги; возвращает {период: изменено строк}.'''
+    now = now or timezone.now()
+    return {
+        period: refresh_period(period, now, full)
+        for period in periods or const.RANKING_WINDOWS
+    }
+
+
+def mark_stale(recipes):
+    '''Отмечает для пересчёта рейтинги рецептов, у которых удалили
+    добавления в избранное или корзину.'''
+    RecipeRanking.objects.filter(
+        recipe__in=recipes, stale=False
+    ).update(stale=True)
+
+
+def order_by_ranking(queryset, period):
+    '''Рецепты из рейтинга периода по убыванию очков.
+
+    Запрос идёт от строк RecipeRanking периода в порядке индекса
+    recipe_ranking_score_idx (period, -score, -recipe), без сортировки
+    всей таблицы рецептов. Рецепты без добавлений за период в рейтинг
+    не попадают и в списке не показываются. Очки доступны в поле
+    rank_score; id рецепта совпадает с recipe строки рейтинга, так что
+    порядок (-rank_score, -id) идёт по тому же индексу (и по нему же
+    строится курсор).
+    '''
+    return queryset.filter(rankings__period=period).annotate(
+        rank_score=models.F('rankings__score')
+    ).order_by('-rank_score', '-id')
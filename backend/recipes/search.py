@@ -0,0 +1,238 @@
+'''Поиск по ингредиентам и рецептам.
+
+Автодополнение ингредиентов работает по префиксному индексу в памяти
+процесса. Нечёткий поиск по названиям использует триграммы: в PostgreSQL
+через pg_trgm и GIN-индексы, в остальных СУБД через индекс в памяти.
+'''
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import Lock
+from time import monotonic
+from uuid import uuid4
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.cache import cache
+from django.db import connections, models
+
+import api.constants as const
+
+# Порог совпадения, как pg_trgm.similarity_threshold по умолчанию.
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
+TRIGRAM_SEARCH_LIMIT = 100
+
+
+class CachedIndex(ABC):
+    '''Индекс по одной модели, который живёт в памяти процесса.
+
+    Индекс строится при первом обращении и перестраивается, когда
+    меняется версия модели в общем кеше Django (Redis), так что
+    изменения видят все процессы. Версия -- случайная строка: если
+    ключ вытеснен из кеша, появляется новая версия и индексы
+    перестраиваются, а не остаются со старой. Кроме того, индекс
+    старше SEARCH_INDEX_MAX_AGE перестраивается в любом случае.
+    '''
+
+    def __init__(self, model_label):
+        self.model_label = model_label
+        self._lock = Lock()
+        self._version = None
+        self._built = 0
+
+    @property
+    def model(self):
+        from django.apps import apps
+
+        return apps.get_model(self.model_label)
+
+    @staticmethod
+    def version_key(model_label):
+        return f'search:{model_label.lower()}:version'
+
+    @classmethod
+    def invalidate(cls, model_label):
+        cache.set(cls.version_key(model_label), uuid4().hex, None)
+
+    @abstractmethod
+    def _build(self):
+        '''Строит индекс по текущим строкам модели.'''
+
+    def is_fresh(self, version):
+        return (version == self._version and monotonic() - self._built
+                < const.SEARCH_INDEX_MAX_AGE)
+
+    def refresh(self):
+        version = cache.get_or_set(
+            self.version_key(self.model_label), uuid4().hex, None
+        )
+        if not self.is_fresh(version):
+            with self._lock:
+                if not self.is_fresh(version):
+                    self._build()
+                    self._version = version
+                    self._built = monotonic()
+
+
+class IngredientPrefixIndex(CachedIndex):
+    '''Префиксный индекс названий ингредиентов для автодополнения.
+
+    Хранит два отсортированных массива ключей в нижнем регистре: полные
+    названия и хвосты названий, начинающиеся с каждого следующего слова.
+    Сначала возвращаются совпадения с началом названия (точное совпадение
+    идёт первым), затем совпадения с началом любого другого слова.
+    '''
+
+    def __init__(self):
+        super().__init__('recipes.Ingredient')
+        self._names = ([], [])
+        self._words = ([], [])
+
+    def _build(self):
+        names, words = [], []
+        for pk, name, unit in self.model.objects.order_by().values_list(
+            'id', 'name', 'measurement_unit'
+        ):
+            item = {'id': pk, 'name': name, 'measurement_unit': unit}
+            key = name.casefold()
+            names.append((key, pk, item))
+            position = key.find(' ')
+            while position != -1:
+                words.append((key[position + 1:], pk, item))
+                position = key.find(' ', position + 1)
+        names.sort(key=lambda entry: entry[:2])
+        words.sort(key=lambda entry: entry[:2])
+        self._names = ([entry[0] for entry in names],
+                       [entry[2] for entry in names])
+        self._words = ([entry[0] for entry in words],
+                       [entry[2] for entry in words])
+
+    @staticmethod
+    def _scan(index, prefix, limit, result, seen):
+        keys, items = index
+        position = bisect_left(keys, prefix)
+        while (len(result) < limit and position < len(keys)
+               and keys[position].startswith(prefix)):
+            item = items[position]
+            if item['id'] not in seen:
+                seen.add(item['id'])
+                result.append(item)
+            position += 1
+
+    def search(self, prefix, limit):
+        self.refresh()
+        prefix = prefix.casefold().strip()
+        result, seen = [], set()
+        self._scan(self._names, prefix, limit, result, seen)
+        if prefix:
+            self._scan(self._words, prefix, limit, result, seen)
+        return result
+
+
+def trigrams(value):
+    '''Множество триграмм строки по правилам pg_trgm.'''
+    words = ''.join(
+        char if char.isalnum() else ' ' for char in value.casefold()
+    ).split()
+    result = set()
+    for word in words:
+        padded = f'  {word} '
+        result.update(
+            padded[i:i + 3] for i in range(len(padded) - 2)
+        )
+    return result
+
+
+class TrigramIndex(CachedIndex):
+    '''Триграммный индекс текстового поля модели.
+
+    Замена pg_trgm для СУБД без него: считает ту же меру сходства
+    (доля общих триграмм) по инвертированному списку в памяти.
+    '''
+
+    def __init__(self, model_label, field):
+        super().__init__(model_label)
+        self.field = field
+        self._postings = {}
+        self._sizes = {}
+
+    def _build(self):
+        postings, sizes = defaultdict(list), {}
+        for pk, value in self.model.objects.order_by().values_list(
+            'pk', self.field
+        ):
+            grams = trigrams(value)
+            sizes[pk] = len(grams)
+            for gram in grams:
+                postings[gram].append(pk)
+        self._postings, self._sizes = dict(postings), sizes
+
+    def search(self, query):
+        '''Все пары (pk, сходство) выше порога по убыванию сходства.'''
+        self.refresh()
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        matches = []
+        for pk, count in shared.items():
+            similarity = count / (len(grams) + self._sizes[pk] - count)
+            if similarity >= TRIGRAM_SIMILARITY_THRESHOLD:
+                matches.append((pk, similarity))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches
+
+
+ingredient_index = IngredientPrefixIndex()
+trigram_indexes = {
+    ('recipes.Ingredient', 'name'): TrigramIndex('recipes.Ingredient',
+                                                 'name'),
+    ('recipes.Recipe', 'name'): TrigramIndex('recipes.Recipe', 'name'),
+}
+
+
+def allowed_matches(queryset, matches, limit):
+    '''Первые limit совпадений индекса, которые есть в queryset.
+
+    Совпадения проверяются по queryset пачками в порядке сходства,
+    поэтому его фильтры применяются до отбора лучших, а не после.
+    '''
+    found = []
+    for start in range(0, len(matches), limit):
+        batch = matches[start:start + limit]
+        present = set(queryset.filter(
+            pk__in=[pk for pk, _ in batch]
+        ).order_by().values_list('pk', flat=True))
+        found.extend(match for match in batch if match[0] in present)
+        if len(found) >= limit:
+            break
+    return found[:limit]
+
+
+def trigram_search(queryset, field, query):
+    '''Нечёткий поиск с сортировкой по сходству (поле similarity).
+
+    Если у queryset уже есть сортировка (полнотекстовый поиск,
+    рейтинг), она сохраняется, а сходство только отбирает строки.
+    Без pg_trgm возвращаются лучшие TRIGRAM_SEARCH_LIMIT совпадений
+    среди строк queryset, поэтому его фильтры стоит задать заранее.
+    '''
+    ordering = queryset.query.order_by or ('-similarity', field)
+    if connections[queryset.db].vendor == 'postgresql':
+        return queryset.annotate(
+            similarity=TrigramSimilarity(field, query)
+        ).filter(
+            **{f'{field}__trigram_similar': query}
+        ).order_by(*ordering)
+    index = trigram_indexes[(queryset.model._meta.label, field)]
+    matches = allowed_matches(
+        queryset, index.search(query), TRIGRAM_SEARCH_LIMIT
+    )
+    if not matches:
+        return queryset.none()
+    return queryset.filter(pk__in=[pk for pk, _ in matches]).annotate(
+        similarity=models.Case(
+            *(models.When(pk=pk, then=models.Value(similarity))
+              for pk, similarity in matches),
+            output_field=models.FloatField(),
+        )
+    ).order_by(*ordering)
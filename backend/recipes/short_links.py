@@ -0,0 +1,241 @@
+'''Короткие коды рецептов и их разрешение.
+
+Код нового рецепта -- это его id, переставленный шифром Фейстеля
+с ключом SHORT_CODE_KEY в пределах 62^SHORT_CODE_LEN и записанный
+в base62. Перестановка взаимно однозначна, поэтому коды не совпадают
+и не требуют проверки в базе. Код записывается в поле short_code сразу
+после вставки (store_short_codes), так что смена ключа не меняет уже
+выданные ссылки. Старые случайные коды из 6 символов хранятся там же.
+
+Соответствия «короткий код -> id рецепта» и «id рецепта -> код»
+хранятся в общем кеше Django (Redis, см. settings.CACHES) и в
+ограниченном LRU в памяти процесса. Неизвестные коды тоже кешируются,
+но ненадолго. Записи LRU помечены версией из общего кеша: изменение
+или удаление рецепта стирает его записи общего кеша и меняет версию,
+так что записи процесса во всех воркерах сразу перестают действовать.
+Версия читается один раз на запрос (resolve() или codes() по списку id).
+'''
+import hashlib
+import hmac
+import string
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+import api.constants as const
+
+MISSING = 0
+
+ALPHABET = string.digits + string.ascii_letters
+CODE_SPACE = len(ALPHABET) ** const.SHORT_CODE_LEN
+HALF_BITS = ((CODE_SPACE - 1).bit_length() + 1) // 2
+HALF_MASK = (1 << HALF_BITS) - 1
+FEISTEL_ROUNDS = 4
+
+
+def _round(number, value):
+    digest = hmac.new(
+        settings.SHORT_CODE_KEY.encode(), f'{number}:{value}'.encode(),
+        hashlib.sha256,
+    ).digest()
+    return int.from_bytes(digest[:8], 'big') & HALF_MASK
+
+
+def _feistel(value, inverse=False):
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    if inverse:
+        for number in reversed(range(FEISTEL_ROUNDS)):
+            left, right = right ^ _round(number, left), left
+    else:
+        for number in range(FEISTEL_ROUNDS):
+            left, right = right, left ^ _round(number, right)
+    return (left << HALF_BITS) | right
+
+
+def _permute(value, inverse=False):
+    # Шифр работает на 2^(2*HALF_BITS) значениях; выходы за CODE_SPACE
+    # шифруются повторно, пока не попадут в него (cycle walking).
+    value = _feistel(value, inverse)
+    while value >= CODE_SPACE:
+        value = _feistel(value, inverse)
+    return value
+
+
+def encode_short_code(pk):
+    '''Короткий код рецепта по его id.'''
+    if not 0 < pk < CODE_SPACE:
+        raise ValueError(f'id {pk} не помещается в короткий код.')
+    value = _permute(pk)
+    chars = []
+    for _ in range(const.SHORT_CODE_LEN):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def decode_short_code(code):
+    '''id рецепта по короткому коду или None, если код не наш.'''
+    if len(code) != const.SHORT_CODE_LEN:
+        return None
+    value = 0
+    for char in code:
+        digit = ALPHABET.find(char)
+        if digit == -1:
+            return None
+        value = value * len(ALPHABET) + digit
+    return _permute(value, inverse=True) or None
+
+
+class LRUCache:
+    '''Ограниченный кеш в памяти процесса с временем жизни записей.'''
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ShortLinkResolver:
+
+    def __init__(self):
+        self.local = LRUCache(const.SHORT_LINK_LOCAL_SIZE,
+                              const.SHORT_LINK_LOCAL_TIMEOUT)
+
+    @property
+    def model(self):
+        from django.apps import apps
+
+        return apps.get_model('recipes.Recipe')
+
+    version_key = 'short-link:version'
+
+    @staticmethod
+    def code_key(code):
+        return f'short-link:code:{code}'
+
+    @staticmethod
+    def recipe_key(pk):
+        return f'short-link:recipe:{pk}'
+
+    def version(self):
+        return cache.get_or_set(self.version_key, uuid4().hex, None)
+
+    def local_get(self, key, version):
+        '''Значение из памяти процесса, если оно записано при version.'''
+        entry = self.local.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1]
+
+    def resolve(self, code):
+        '''id рецепта по короткому коду или None.'''
+        key = self.code_key(code)
+        # Версия читается до значения: если рецепт удалят между ними,
+        # запись ниже уже будет помечена старой версией.
+        version = self.version()
+        pk = self.local_get(key, version)
+        if pk is None:
+            pk = cache.get(key)
+            if pk is None:
+                lookup = Q(short_code=code)
+                decoded = decode_short_code(code)
+                if decoded is not None:
+                    lookup |= Q(pk=decoded, short_code=None)
+                pk = self.model.objects.filter(
+                    lookup
+                ).values_list('pk', flat=True).first() or MISSING
+                cache.set(key, pk, const.SHORT_LINK_CACHE_TIMEOUT if pk
+                          else const.SHORT_LINK_MISSING_TIMEOUT)
+            self.local.set(key, (version, pk))
+        return pk or None
+
+    def codes(self, pks):
+        '''Словарь {id: код} для существующих рецептов из pks.'''
+        result, missing = {}, []
+        version = self.version()
+        for pk in pks:
+            code = self.local_get(self.recipe_key(pk), version)
+            if code is None:
+                missing.append(pk)
+            else:
+                result[pk] = code
+        if missing:
+            cached = cache.get_many(self.recipe_key(pk) for pk in missing)
+            loaded = {}
+            for pk in missing:
+                code = cached.get(self.recipe_key(pk))
+                if code is None:
+                    loaded[pk] = None
+                else:
+                    result[pk] = code
+            if loaded:
+                loaded.update(
+                    (pk, code or encode_short_code(pk))
+                    for pk, code in self.model.objects.filter(
+                        pk__in=loaded
+                    ).values_list('pk', 'short_code')
+                )
+                cache.set_many({
+                    self.recipe_key(pk): code
+                    for pk, code in loaded.items() if code
+                }, const.SHORT_LINK_CACHE_TIMEOUT)
+                result.update(
+                    (pk, code) for pk, code in loaded.items() if code
+                )
+            for pk in missing:
+                if pk in result:
+                    self.local.set(
+                        self.recipe_key(pk), (version, result[pk])
+                    )
+        return {pk: result[pk] for pk in pks if pk in result}
+
+    def invalidate(self, pk, code=None):
+        keys = [self.recipe_key(pk)]
+        if code:
+            keys.append(self.code_key(code))
+        cache.delete_many(keys)
+        cache.set(self.version_key, uuid4().hex, None)
+
+
+short_links = ShortLinkResolver()
+
+
+def store_short_codes(recipes):
+    '''Записывает вычисленные коды рецептам без кода (id уже известны).'''
+    missing = [recipe for recipe in recipes if not recipe.short_code]
+    for recipe in missing:
+        recipe.short_code = encode_short_code(recipe.pk)
+    short_links.model.objects.bulk_update(missing, ('short_code',))
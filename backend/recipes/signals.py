@@ -0,0 +1,97 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.counted import rows_deleted
+from users.models import Subscribe, User
+from .counters import add, count_cascade, count_removed, counters_for
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, ShoppingListItem)
+from .search import CachedIndex
+from .short_links import short_links, store_short_codes
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_search_indexes(sender, **kwargs):
+    CachedIndex.invalidate(sender._meta.label)
+
+
+@receiver(post_save, sender=Recipe)
+def store_short_code(sender, instance, created, raw, **kwargs):
+    # Пакетная вставка (см. ndjson.py) пишет коды сама, одним запросом.
+    if created and not raw and not getattr(instance, 'defer_short_code',
+                                           False):
+        store_short_codes([instance])
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_short_link(sender, instance, **kwargs):
+    short_links.invalidate(instance.pk, instance.get_short_code())
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, raw, update_fields,
+                                **kwargs):
+    if raw or (update_fields and not {'name', 'text'} & set(update_fields)):
+        return
+    Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remember_cart_ingredients(sender, instance, **kwargs):
+    # При каскадном удалении рецепта его ингредиенты могут исчезнуть
+    # раньше корзины, поэтому список запоминается до удаления.
+    instance.shopping_list_ingredients = list(
+        RecipeIngredient.objects.filter(
+            recipe_id=instance.recipe_id
+        ).values_list('ingredient_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def update_shopping_list(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ingredients = getattr(instance, 'shopping_list_ingredients', None)
+    if ingredients is None:
+        ingredients = RecipeIngredient.objects.filter(
+            recipe_id=instance.recipe_id
+        ).values('ingredient_id')
+    ShoppingListItem.objects.refresh([instance.user_id], ingredients)
+
+
+def loaded_target(instance, key):
+    return getattr(instance, key.name) if key.is_cached(instance) else None
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscribe)
+def count_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    # Прежние значения помнит только объект, загруженный из базы
+    # (CountedMixin.from_db); у остальных цель считается прежней.
+    loaded = getattr(instance, 'counter_keys', None)
+    for key, target, field in counters_for(sender):
+        new = getattr(instance, key.attname)
+        if not created:
+            old = loaded.get(key.attname) if loaded is not None else new
+            if old == new:
+                continue
+            if old is not None:
+                add(target, field, old, -1)
+        add(target, field, new, 1, loaded_target(instance, key))
+    instance.remember_counter_keys()
+
+
+@receiver(rows_deleted)
+def count_deleted(sender, rows, **kwargs):
+    count_removed(sender, rows)
+
+
+@receiver(pre_delete, sender=User)
+def count_cascade_deleted(sender, instance, **kwargs):
+    count_cascade(instance)
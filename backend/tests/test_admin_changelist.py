@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.pagination import invalidate_counts
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscribe
+
+User = get_user_model()
+
+CHANGELISTS = (
+    'recipes/recipe',
+    'recipes/ingredient',
+    'recipes/recipeingredient',
+    'recipes/favorite',
+    'recipes/shoppingcart',
+    'users/user',
+    'users/subscribe',
+)
+
+
+class AdminChangelistTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@foodgram.ru', username='admin', password='pass',
+            first_name='Имя', last_name='Фамилия',
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        invalidate_counts()
+        self.client.force_login(self.admin)
+
+    def add_recipes(self, count):
+        for _ in range(count):
+            number = User.objects.count()
+            author = User.objects.create_user(
+                email=f'user{number}@foodgram.ru', username=f'user{number}',
+                password='pass', first_name='Имя', last_name='Фамилия',
+            )
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10,
+            )
+            recipe.tags.add(self.tag)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=1)
+                for ingredient in self.ingredients
+            )
+            Favorite.objects.create(user=self.admin, recipe=recipe)
+            ShoppingCart.objects.create(user=author, recipe=recipe)
+            Subscribe.objects.create(subscriber=self.admin, author=author)
+
+    def count_queries(self, url):
+        invalidate_counts()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_queries_do_not_depend_on_rows(self):
+        self.add_recipes(2)
+        before = {
+            name: self.count_queries(f'/admin/{name}/')
+            for name in CHANGELISTS
+        }
+        self.add_recipes(6)
+        after = {
+            name: self.count_queries(f'/admin/{name}/')
+            for name in CHANGELISTS
+        }
+        self.assertEqual(after, before)
+
+    def result_count(self, name):
+        response = self.client.get(f'/admin/{name}/')
+        return response.context['cl'].result_count
+
+    def test_counts_follow_edits(self):
+        self.add_recipes(1)
+        self.assertEqual(self.result_count('recipes/ingredient'), 3)
+        self.assertEqual(self.result_count('recipes/recipeingredient'), 3)
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        RecipeIngredient.objects.create(
+            recipe=Recipe.objects.get(), ingredient=salt, amount=1
+        )
+        self.assertEqual(self.result_count('recipes/ingredient'), 4)
+        self.assertEqual(self.result_count('recipes/recipeingredient'), 4)
+
+    def search(self, name, term):
+        response = self.client.get(f'/admin/{name}/', {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['cl'].result_list)
+
+    def test_search(self):
+        self.add_recipes(3)
+        recipe = Recipe.objects.order_by('pk').last()
+        recipe.name = 'Шарлотка с яблоками'
+        recipe.save()
+        self.assertEqual(self.search('recipes/recipe', 'шарлотка'), [recipe])
+        self.assertEqual(
+            self.search('recipes/recipe', str(recipe.pk)), [recipe]
+        )
+        self.assertEqual(
+            self.search('recipes/recipe', recipe.author.username), [recipe]
+        )
+        self.assertEqual(self.search('users/user', 'user3'),
+                         [recipe.author])
+        self.assertEqual(self.search('users/user', 'USER3'),
+                         [recipe.author])
+        self.assertEqual(
+            [favorite.recipe for favorite in
+             self.search('recipes/favorite', 'шарлотки')],
+            [recipe],
+        )
+        self.assertEqual(self.search('recipes/recipe', 'ъъъ'), [])
+
+    def test_autocomplete(self):
+        self.add_recipes(2)
+        response = self.client.get('/admin/autocomplete/', {
+            'term': 'user2', 'app_label': 'recipes', 'model_name': 'recipe',
+            'field_name': 'author',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['text'] for item in response.json()['results']], ['user2']
+        )
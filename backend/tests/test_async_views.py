@@ -0,0 +1,180 @@
+import json
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from backend.asgi import application
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.short_links import short_links
+
+User = get_user_model()
+
+
+@override_settings(ROOT_URLCONF='backend.asgi_urls')
+class AsyncViewsTest(APITestCase):
+    '''Асинхронные вьюхи отвечают теми же байтами, что и DRF.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+        cls.token = Token.objects.create(user=cls.author)
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Блины', text='Описание',
+            cooking_time=20,
+        )
+        cls.recipe.tags.add(cls.tag)
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=200
+        )
+        Favorite.objects.create(user=cls.author, recipe=cls.recipe)
+
+    def setUp(self):
+        cache.clear()
+        short_links.local.clear()
+        self.async_client = AsyncClient()
+
+    def auth(self, token=None):
+        return {'authorization': f'Token {token or self.token.key}'}
+
+    async def assert_same(self, url, **headers):
+        with override_settings(ROOT_URLCONF='backend.urls'):
+            expected = await sync_to_async(self.client.get)(url, **{
+                f'HTTP_{name.upper()}': value
+                for name, value in headers.items()
+            })
+        response = await self.async_client.get(url, **headers)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['Content-Type'], expected['Content-Type'])
+        return response
+
+    async def test_tags(self):
+        await self.assert_same('/api/tags/')
+        await self.assert_same(f'/api/tags/{self.tag.pk}/')
+        await self.assert_same('/api/tags/0/')
+        await self.assert_same('/api/tags/', **self.auth())
+        response = await self.assert_same('/api/tags/', **self.auth('wrong'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_ingredient_autocomplete(self):
+        await self.assert_same('/api/ingredients/?name=му')
+        await self.assert_same('/api/ingredients/?name=ммука')
+        await self.assert_same('/api/ingredients/')
+        response = await self.assert_same(
+            '/api/ingredients/?name=му', **self.auth('wrong')
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_recipe_detail(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        response = await self.assert_same(url)
+        self.assertFalse(response.json()['is_favorited'])
+        response = await self.assert_same(url, **self.auth())
+        self.assertTrue(response.json()['is_favorited'])
+        await self.assert_same(url, **self.auth('wrong'))
+        await self.assert_same('/api/recipes/0/')
+        response = await self.async_client.get(url, accept='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+    async def test_other_methods_use_drf(self):
+        response = await self.async_client.patch(
+            f'/api/recipes/{self.recipe.pk}/', {'name': 'Оладьи'},
+            content_type='application/json', **self.auth(),
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['name'], 'Оладьи')
+        response = await self.async_client.post(
+            '/api/tags/', {}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 405)
+
+    async def test_redirect_link(self):
+        code = self.recipe.get_short_code()
+        for _ in range(2):
+            response = await self.async_client.get(f'/s/{code}/')
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(
+                response['Location'],
+                f'http://testserver/recipes/{self.recipe.pk}/',
+            )
+        response = await self.async_client.get('/s/unknown/')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ROOT_URLCONF='backend.asgi_urls')
+class AsgiApplicationTest(TransactionTestCase):
+    '''Запросы через backend.asgi.application, как под uvicorn.
+
+    ORM в потоковых ответах работает в отдельном потоке запроса,
+    поэтому данные должны быть закоммичены: TransactionTestCase.
+    '''
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@foodgram.ru', username='admin', password='pass',
+            first_name='Админ', last_name='Админов',
+        )
+        self.token = Token.objects.create(user=self.admin)
+        flour = Ingredient.objects.create(name='мука', measurement_unit='г')
+        for name in ('Блины', 'Оладьи'):
+            recipe = Recipe.objects.create(
+                author=self.admin, name=name, text='Описание',
+                cooking_time=20,
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=flour, amount=100
+            )
+            ShoppingCart.objects.create(user=self.admin, recipe=recipe)
+
+    def get(self, path, query=''):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [
+                (b'host', b'localhost'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+            'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(application)(scope, receive, send)
+        self.assertEqual(messages[0]['status'], 200)
+        return b''.join(message.get('body', b'') for message in messages[1:])
+
+    def test_download_shopping_cart(self):
+        body = self.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(body.decode(), 'Список покупок:\nмука - 200 г.')
+        body = self.get('/api/recipes/download_shopping_cart/',
+                        'format=json')
+        self.assertEqual(json.loads(body), [
+            {'name': 'мука', 'measurement_unit': 'г', 'amount': 200},
+        ])
+
+    def test_export(self):
+        lines = self.get('/api/recipes/export/').decode().splitlines()
+        self.assertEqual(
+            sorted(json.loads(line)['name'] for line in lines),
+            ['Блины', 'Оладьи'],
+        )
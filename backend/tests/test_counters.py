@@ -0,0 +1,156 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe
+
+User = get_user_model()
+
+
+class CountersTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader, cls.other = (
+            User.objects.create_user(
+                email=f'{name}@foodgram.ru', username=name,
+                first_name='Имя', last_name='Фамилия', password='pass',
+            )
+            for name in ('author', 'reader', 'other')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Блины', text='Описание',
+            cooking_time=20,
+        )
+
+    def counts(self, obj, *fields):
+        obj.refresh_from_db(fields=fields)
+        return tuple(getattr(obj, field) for field in fields)
+
+    def test_favorite_and_cart_endpoints(self):
+        self.client.force_authenticate(self.reader)
+        url = f'/api/recipes/{self.recipe.pk}/'
+        self.client.post(url + 'favorite/')
+        self.client.post(url + 'shopping_cart/')
+        self.assertEqual(
+            self.counts(self.recipe, 'favorites_count',
+                        'shopping_carts_count'), (1, 1)
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.json()['favorites_count'], 1)
+        self.client.delete(url + 'favorite/')
+        self.client.delete(url + 'shopping_cart/')
+        self.assertEqual(
+            self.counts(self.recipe, 'favorites_count',
+                        'shopping_carts_count'), (0, 0)
+        )
+
+    def test_subscribe_endpoints(self):
+        self.client.force_authenticate(self.reader)
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['followers_count'], 1)
+        self.assertEqual(response.json()['recipes_count'], 1)
+        self.assertEqual(self.counts(self.author, 'followers_count'), (1,))
+        self.assertEqual(self.counts(self.reader, 'following_count'), (1,))
+        self.client.delete(url)
+        self.assertEqual(self.counts(self.author, 'followers_count'), (0,))
+        self.assertEqual(self.counts(self.reader, 'following_count'), (0,))
+
+    def test_recipe_create_move_and_delete(self):
+        self.assertEqual(self.counts(self.author, 'recipes_count'), (1,))
+        recipe = Recipe.objects.create(
+            author=self.author, name='Оладьи', text='Описание',
+            cooking_time=15,
+        )
+        self.assertEqual(self.counts(self.author, 'recipes_count'), (2,))
+        recipe.author = self.other
+        recipe.save()
+        self.assertEqual(self.counts(self.author, 'recipes_count'), (1,))
+        self.assertEqual(self.counts(self.other, 'recipes_count'), (1,))
+        recipe.delete()
+        self.assertEqual(self.counts(self.other, 'recipes_count'), (0,))
+
+    def test_loaded_recipe_move(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.author = self.other
+        recipe.save()
+        self.assertEqual(self.counts(self.author, 'recipes_count'), (0,))
+        self.assertEqual(self.counts(self.other, 'recipes_count'), (1,))
+
+    def test_bulk_and_cascade_deletes(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Favorite.objects.create(user=self.other, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.reader, recipe=self.recipe)
+        Subscribe.objects.create(subscriber=self.reader, author=self.author)
+        Subscribe.objects.create(subscriber=self.author, author=self.other)
+        Favorite.objects.filter(user=self.other).delete()
+        self.assertEqual(self.counts(self.recipe, 'favorites_count'), (1,))
+        self.reader.delete()
+        self.assertEqual(
+            self.counts(self.recipe, 'favorites_count',
+                        'shopping_carts_count'), (0, 0)
+        )
+        self.assertEqual(
+            self.counts(self.author, 'followers_count', 'following_count'),
+            (0, 1),
+        )
+        self.author.delete()
+        self.assertEqual(self.counts(self.other, 'followers_count'), (0,))
+
+    def test_user_delete_updates_each_counter_once(self):
+        recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Описание',
+                cooking_time=10,
+            )
+            for i, author in enumerate((self.author, self.author,
+                                        self.reader))
+        ]
+        for recipe in recipes:
+            Favorite.objects.create(user=self.reader, recipe=recipe)
+            ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        with CaptureQueriesContext(connection) as queries:
+            self.reader.delete()
+        updates = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "recipes_recipe"')
+        ]
+        self.assertEqual(len(updates), 2, updates)
+        for recipe in recipes[:2]:
+            self.assertEqual(
+                self.counts(recipe, 'favorites_count',
+                            'shopping_carts_count'), (0, 0)
+            )
+
+    def test_save_inserts_missing_row(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=self.recipe.pk).delete()
+        stale.save()
+        self.assertTrue(Recipe.objects.filter(pk=self.recipe.pk).exists())
+
+    def test_save_keeps_concurrent_counter_changes(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        stale.name = 'Тонкие блины'
+        stale.save()
+        self.assertEqual(self.counts(self.recipe, 'favorites_count'), (1,))
+
+    def test_reconcile_counters(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Recipe.objects.update(favorites_count=5)
+        User.objects.filter(pk=self.author.pk).update(recipes_count=0)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_counters', '--verify', stdout=StringIO())
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Исправлено счётчиков: 2', out.getvalue())
+        self.assertEqual(self.counts(self.recipe, 'favorites_count'), (1,))
+        self.assertEqual(self.counts(self.author, 'recipes_count'), (1,))
+        call_command('reconcile_counters', '--verify', stdout=StringIO())
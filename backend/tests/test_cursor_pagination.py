@@ -0,0 +1,119 @@
+import base64
+import json
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+
+from recipes.models import Favorite, Recipe
+from recipes.rankings import refresh
+from users.models import Subscribe
+
+User = get_user_model()
+
+
+class CursorPaginationTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Читатель', last_name='Читателев', password='pass',
+        )
+        for i in range(7):
+            author = User.objects.create_user(
+                email=f'author{i}@foodgram.ru', username=f'author{i}',
+                first_name='Автор', last_name=str(i), password='pass',
+            )
+            Subscribe.objects.create(subscriber=cls.reader, author=author)
+            for j in range(2):
+                Recipe.objects.create(
+                    author=author, name=f'Рецепт {i}-{j}',
+                    text='Описание', cooking_time=10,
+                )
+        # Одинаковое время публикации проверяет разбор ничьих по id.
+        Recipe.objects.update(pub_date=Recipe.objects.first().pub_date)
+        cls.expected = list(
+            Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.json())
+            page = [item['id'] for item in response.json()['results']]
+            ids = ids + page if link == 'next' else page + ids
+            url = response.json()[link]
+        return ids
+
+    def test_forward_and_backward(self):
+        self.assertEqual(
+            self.walk('/api/recipes/?cursor=&limit=4', 'next'), self.expected
+        )
+        response = self.client.get('/api/recipes/?cursor=&limit=4')
+        while response.json()['next']:
+            last_url = response.json()['next']
+            response = self.client.get(last_url)
+        self.assertEqual(self.walk(last_url, 'previous'), self.expected)
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get('/api/recipes/?page=2&limit=4')
+        self.assertEqual(response.json()['count'], len(self.expected))
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']],
+            self.expected[4:8],
+        )
+
+    def test_search_keeps_its_ordering(self):
+        Recipe.objects.filter(name__endswith='-1').update(text='Блины')
+        Recipe.objects.filter(name__startswith='Рецепт 2').update(
+            name='Блины'
+        )
+        for recipe in Recipe.objects.order_by('id')[:5]:
+            Favorite.objects.create(user=self.reader, recipe=recipe)
+        refresh()
+        for params in ({'search': 'Блины'}, {'name': 'Рецепт 3'},
+                       {'ordering': 'popular'}):
+            response = self.client.get('/api/recipes/', {
+                **params, 'limit': 100
+            })
+            expected = [item['id'] for item in response.json()['results']]
+            self.assertTrue(expected, params)
+            self.assertEqual(self.walk(
+                f'/api/recipes/?{urlencode(params)}&cursor=&limit=2', 'next'
+            ), expected, params)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor(self):
+        for position in (['notadate', 1, False], [{'a': 1}, 2, False],
+                         ['2024-01-01T00:00:00Z', 'x', False],
+                         ['2024-01-01T00:00:00Z', None, False],
+                         ['2024-01-01T00:00:00Z', 10 ** 30, False]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(position).encode()
+            ).decode()
+            response = self.client.get('/api/recipes/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, position)
+        self.client.force_authenticate(self.reader)
+        cursor = base64.urlsafe_b64encode(b'[[1], 2, false]').decode()
+        response = self.client.get(
+            '/api/users/subscriptions/', {'cursor': cursor}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_subscriptions(self):
+        self.client.force_authenticate(self.reader)
+        names = []
+        url = '/api/users/subscriptions/?cursor=&limit=3&recipes_limit=1'
+        while url:
+            response = self.client.get(url)
+            names += [item['username'] for item in response.json()['results']]
+            url = response.json()['next']
+        self.assertEqual(names, [f'author{i}' for i in range(7)])
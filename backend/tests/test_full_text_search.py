@@ -0,0 +1,59 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+
+class FullTextSearchTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Автор', last_name='Авторов', password='pass',
+        )
+        soup = Tag.objects.create(name='Суп', slug='soup')
+        for name, text in (
+            ('Грибной суп', 'Белые грибы варить на бульоне.'),
+            ('Бульон', 'Основа для супа.'),
+            ('Оливье', 'Салат с колбасой.'),
+        ):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=30
+            )
+            if name == 'Грибной суп':
+                recipe.tags.add(soup)
+
+    def search(self, **params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_name_matches_rank_above_text_matches(self):
+        self.assertEqual(self.search(search='суп'), ['Грибной суп', 'Бульон'])
+
+    def test_search_combines_with_tags(self):
+        self.assertEqual(
+            self.search(search='суп', tags='soup'), ['Грибной суп']
+        )
+
+    def test_backfill_command(self):
+        Recipe.objects.update(search_vector=None)
+        out, err = StringIO(), StringIO()
+        call_command('update_search_vectors', batch_size=2,
+                     stdout=out, stderr=err)
+        missing = Recipe.objects.filter(search_vector__isnull=True)
+        if connection.vendor == 'postgresql':
+            self.assertFalse(missing.exists())
+            self.assertIn('обновлено рецептов: 3', out.getvalue())
+        else:
+            # Без PostgreSQL команда ничего не меняет.
+            self.assertEqual(missing.count(), 3)
+            self.assertEqual(out.getvalue(), '')
+            self.assertIn('только в PostgreSQL', err.getvalue())
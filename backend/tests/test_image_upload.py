@@ -0,0 +1,111 @@
+import json
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+import api.constants as const
+from recipes.models import Ingredient, Recipe, Tag
+from tests.test_image_variants import image_base64
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_file(size=(64, 48), name='photo.png'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANT_WORKERS=0)
+class ImageUploadTest(APITestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.flour = Ingredient.objects.create(name='мука',
+                                              measurement_unit='г')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def recipe_data(self):
+        return {
+            'name': 'Блины', 'text': 'Описание', 'cooking_time': 20,
+            'tags': [self.tag.pk],
+            'ingredients': [{'id': self.flour.pk, 'amount': 200}],
+        }
+
+    def test_create_recipe_multipart(self):
+        response = self.client.post(
+            '/api/recipes/',
+            {'data': json.dumps(self.recipe_data()), 'image': image_file()},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        self.assertEqual(recipe.image.width, 64)
+        self.assertEqual(recipe.recipe.get().amount, 200)
+
+    def test_create_recipe_base64(self):
+        response = self.client.post(
+            '/api/recipes/', {**self.recipe_data(), 'image': image_base64()},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_avatar_multipart(self):
+        response = self.client.put(
+            '/api/users/me/avatar/', {'avatar': image_file()},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.avatar)
+
+    def test_invalid_data_part(self):
+        response = self.client.post(
+            '/api/recipes/', {'data': '{', 'image': image_file()},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch.object(const, 'IMAGE_UPLOAD_MAX_SIZE', 1024)
+    def test_too_large(self):
+        upload = SimpleUploadedFile(
+            'photo.png', b'0' * 4096, 'image/png'
+        )
+        response = self.client.put(
+            '/api/users/me/avatar/', {'avatar': upload}, format='multipart',
+        )
+        self.assertEqual(response.status_code, 413)
+
+    @mock.patch.object(const, 'IMAGE_MAX_SIDE', 32)
+    def test_too_wide(self):
+        for data, format in (
+            ({'avatar': image_file()}, 'multipart'),
+            ({'avatar': image_base64()}, 'json'),
+        ):
+            with self.subTest(format=format):
+                response = self.client.put(
+                    '/api/users/me/avatar/', data, format=format,
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('avatar', response.json())
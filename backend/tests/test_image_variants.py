@@ -0,0 +1,173 @@
+import base64
+import shutil
+import tempfile
+from concurrent.futures import Future
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+import api.constants as const
+from api.images import (get_executor, mark_finished, mark_or_discard,
+                        render_variants, variant_names, variants_done)
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_base64(size=(800, 600), mode='RGBA'):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 100, 50, 128)[:len(mode)]).save(
+        buffer, 'PNG'
+    )
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANT_WORKERS=0)
+class ImageVariantsTest(APITestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def upload_avatar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                '/api/users/me/avatar/', {'avatar': image_base64()},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_avatar_variants(self):
+        self.upload_avatar()
+        self.user.refresh_from_db()
+        response = self.client.get('/api/users/me/')
+        variants = response.json()['avatar_variants']
+        self.assertEqual(set(variants), {'webp', 'jpeg'})
+        self.assertEqual(
+            set(variants['webp']),
+            {f'{width}w' for width in const.IMAGE_VARIANT_WIDTHS},
+        )
+        storage = self.user.avatar.storage
+        for (width, extension), name in variant_names(self.user.avatar.name):
+            with Image.open(storage.path(name)) as image:
+                self.assertEqual(image.format, extension.upper())
+                self.assertEqual(image.width, min(width, 800))
+
+    def test_delete_avatar_removes_variants(self):
+        self.upload_avatar()
+        self.user.refresh_from_db()
+        storage, name = self.user.avatar.storage, self.user.avatar.name
+        response = self.client.delete('/api/users/me/avatar/')
+        self.assertEqual(response.status_code, 204)
+        for _, variant in variant_names(name):
+            self.assertFalse(storage.exists(variant))
+
+    def test_replaced_avatar_removes_old_variants(self):
+        self.upload_avatar()
+        self.user.refresh_from_db()
+        storage, name = self.user.avatar.storage, self.user.avatar.name
+        self.upload_avatar()
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.avatar.name, name)
+        for _, variant in variant_names(name):
+            self.assertFalse(storage.exists(variant))
+        for _, variant in variant_names(self.user.avatar.name):
+            self.assertTrue(storage.exists(variant))
+
+    def test_variants_not_ready(self):
+        # Копии создаются после фиксации транзакции, до неё карта пуста.
+        response = self.client.put(
+            '/api/users/me/avatar/', {'avatar': image_base64()},
+            format='json',
+        )
+        self.assertEqual(response.json()['avatar_variants'], {})
+
+    def test_list_does_not_check_storage(self):
+        self.upload_avatar()
+        self.user.refresh_from_db()
+        with mock.patch(
+            'django.core.files.storage.FileSystemStorage.exists'
+        ) as exists:
+            response = self.client.get('/api/users/me/')
+        self.assertTrue(response.json()['avatar_variants'])
+        exists.assert_not_called()
+
+    def test_replaced_image_is_not_ready(self):
+        self.upload_avatar()
+        User.objects.filter(pk=self.user.pk).update(
+            avatar='media/users/other.png'
+        )
+        self.user.refresh_from_db()
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.json()['avatar_variants'], {})
+
+    def test_command_marks_existing_variants(self):
+        self.upload_avatar()
+        User.objects.filter(pk=self.user.pk).update(avatar_variants_for='')
+        with mock.patch(
+            'recipes.management.commands.generate_image_variants'
+            '.render_variants'
+        ) as render:
+            call_command('generate_image_variants', stdout=StringIO())
+        render.assert_not_called()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_variants_for, self.user.avatar.name)
+
+    def test_pool_errors_are_logged(self):
+        future, mark = Future(), mock.Mock()
+        future.set_exception(OSError('Нет исходника'))
+        with self.assertLogs('api.images', 'ERROR') as logs:
+            variants_done(mark, future)
+        self.assertIn('Нет исходника', logs.output[0])
+        mark_finished()
+        mark.assert_not_called()
+
+    def test_pool_marks_after_request(self):
+        # Служебный поток пула не пишет в базу, отметка ждёт запроса.
+        future, mark = Future(), mock.Mock()
+        future.set_result(None)
+        variants_done(mark, future)
+        mark.assert_not_called()
+        self.client.get('/api/users/me/')
+        mark.assert_called_once_with()
+
+    def test_variants_of_replaced_image_are_deleted(self):
+        # Пул дорисовал копии картинки, которую уже заменили.
+        self.upload_avatar()
+        self.user.refresh_from_db()
+        storage, name = self.user.avatar.storage, self.user.avatar.name
+        User.objects.filter(pk=self.user.pk).update(avatar='users/other.png')
+        mark_or_discard(storage, User, self.user.pk, 'avatar', name)
+        for _, variant in variant_names(name):
+            self.assertFalse(storage.exists(variant))
+
+    def test_process_pool(self):
+        source = f'{MEDIA_ROOT}/pool.png'
+        Image.new('RGB', (400, 200)).save(source)
+        target = f'{MEDIA_ROOT}/variants/pool-160.webp'
+        with self.settings(IMAGE_VARIANT_WORKERS=1):
+            get_executor().submit(
+                render_variants, source, [(target, 160, 'webp')]
+            ).result(timeout=60)
+        with Image.open(target) as image:
+            self.assertEqual(image.size, (160, 80))
@@ -0,0 +1,73 @@
+from time import monotonic
+from unittest import mock
+
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+import api.constants as const
+from recipes.models import Ingredient
+from recipes.search import CachedIndex
+
+
+class IngredientAutocompleteTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('масло', 'масло оливковое', 'Масло сливочное',
+                     'оливки', 'сливки', 'арахисовое масло'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        # Индекс живёт в процессе, а строки тестов откатываются.
+        CachedIndex.invalidate('recipes.Ingredient')
+
+    def search(self, name):
+        response = self.client.get('/api/ingredients/', {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json()]
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(
+            self.search('МАСЛО'),
+            ['масло', 'масло оливковое', 'Масло сливочное',
+             'арахисовое масло'],
+        )
+        self.assertEqual(
+            self.search('олив'), ['оливки', 'масло оливковое']
+        )
+
+    def test_result_is_capped(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'соль {i}', measurement_unit='г')
+            for i in range(const.INGREDIENT_SEARCH_LIMIT + 5)
+        )
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        names = self.search('соль')
+        self.assertEqual(len(names), const.INGREDIENT_SEARCH_LIMIT)
+        self.assertEqual(names[0], 'соль')
+
+    def test_index_follows_catalog_changes(self):
+        self.assertEqual(self.search('сливк'), ['сливки'])
+        Ingredient.objects.create(name='сливки 33%', measurement_unit='мл')
+        Ingredient.objects.filter(name='сливки').delete()
+        self.assertEqual(self.search('сливк'), ['сливки 33%'])
+
+    def test_evicted_version_rebuilds_index(self):
+        self.assertEqual(self.search('сливк'), ['сливки'])
+        # bulk_create не сбрасывает версию, как запись в другом процессе
+        # при потерянном ключе.
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='сливки 10%', measurement_unit='мл')]
+        )
+        cache.delete(CachedIndex.version_key('recipes.Ingredient'))
+        self.assertEqual(self.search('сливк'), ['сливки', 'сливки 10%'])
+
+    def test_old_index_is_rebuilt(self):
+        self.assertEqual(self.search('сливк'), ['сливки'])
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='сливки 10%', measurement_unit='мл')]
+        )
+        self.assertEqual(self.search('сливк'), ['сливки'])
+        later = monotonic() + const.SEARCH_INDEX_MAX_AGE + 1
+        with mock.patch('recipes.search.monotonic', return_value=later):
+            self.assertEqual(self.search('сливк'), ['сливки', 'сливки 10%'])
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import User
+
+
+class LoadIngredientsTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'ingredients.json')
+
+    def write(self, items):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump([
+                {'model': 'recipes.ingredient', 'pk': pk,
+                 'fields': {'name': name, 'measurement_unit': unit}}
+                for pk, (name, unit) in enumerate(items, 1)
+            ], file, ensure_ascii=False)
+
+    def load(self, *args):
+        out = StringIO()
+        call_command('load_ingredients', self.path, *args, stdout=out)
+        return out.getvalue()
+
+    def catalog(self):
+        return set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+    def test_initial_load(self):
+        self.write([('мука', 'г'), ('молоко', 'мл')])
+        self.assertIn('добавлено 2, изменено 0', self.load())
+        self.assertEqual(self.catalog(), {('мука', 'г'), ('молоко', 'мл')})
+
+    def test_unchanged_file_is_skipped(self):
+        self.write([('мука', 'г'), ('молоко', 'мл')])
+        self.load()
+        with CaptureQueriesContext(connection) as queries:
+            output = self.load()
+        self.assertIn('не изменился', output)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('добавлено 0, изменено 0', self.load('--force'))
+
+    def test_changed_file_is_upserted(self):
+        self.write([('мука', 'г'), ('молоко', 'мл'), ('соль', 'г')])
+        self.load()
+        flour = Ingredient.objects.get(name='мука')
+        self.write([('Мука', 'г'), ('молоко', 'мл'), ('сахар', 'г')])
+        self.assertIn(
+            'добавлено 1, изменено 1, удалено 0, нет в файле 1', self.load()
+        )
+        flour.refresh_from_db()
+        self.assertEqual(flour.name, 'Мука')
+        self.assertIn(('соль', 'г'), self.catalog())
+
+    def test_prune_keeps_used_ingredients(self):
+        self.write([('мука', 'г'), ('соль', 'г'), ('перец', 'г')])
+        self.load()
+        author = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='Хлеб', text='Описание', cooking_time=60,
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=Ingredient.objects.get(name='соль'),
+            amount=5,
+        )
+        self.write([('мука', 'г')])
+        self.assertIn('удалено 1, нет в файле 1', self.load('--prune'))
+        self.assertEqual(self.catalog(), {('мука', 'г'), ('соль', 'г')})
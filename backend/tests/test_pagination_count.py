@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from api.pagination import COUNT_VERSION_KEY
+from recipes.models import Favorite, Recipe
+
+User = get_user_model()
+
+
+class PaginationCountTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Автор', last_name='Авторов', password='pass',
+        )
+        for i in range(3):
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Описание',
+                cooking_time=10,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.author)
+
+    def get_count(self, url='/api/recipes/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['count_exact'])
+        return response.json()['count']
+
+    def test_count_is_cached(self):
+        self.get_count()
+        # Страница, теги, ингредиенты и подписки -- без COUNT(*).
+        with self.assertNumQueries(4):
+            self.assertEqual(self.get_count(), 3)
+
+    def test_recipe_write_invalidates_count(self):
+        self.assertEqual(self.get_count(), 3)
+        Recipe.objects.create(
+            author=self.author, name='Новый', text='Описание',
+            cooking_time=10,
+        )
+        self.assertEqual(self.get_count(), 4)
+        Recipe.objects.filter(name='Новый').delete()
+        self.assertEqual(self.get_count(), 3)
+
+    def test_favorite_write_invalidates_filtered_count(self):
+        url = '/api/recipes/?is_favorited=1'
+        self.assertEqual(self.get_count(url), 0)
+        Favorite.objects.create(
+            user=self.author, recipe=Recipe.objects.first()
+        )
+        self.assertEqual(self.get_count(url), 1)
+
+    def test_evicted_version_drops_cached_counts(self):
+        self.assertEqual(self.get_count(), 3)
+        # bulk_create не сбрасывает версию; затем ключ версии вытеснен.
+        Recipe.objects.bulk_create([Recipe(
+            author=self.author, name='Новый', text='Описание',
+            cooking_time=10,
+        )])
+        cache.delete(COUNT_VERSION_KEY)
+        self.assertEqual(self.get_count(), 4)
@@ -0,0 +1,228 @@
+'''Бюджет SQL-запросов для эндпоинтов API.
+
+Каждый эндпоинт вызывается анонимно и от имени авторизованного
+пользователя при нескольких размерах страницы. Количество запросов
+не должно превышать бюджет и не должно зависеть от размера страницы.
+
+Запуск: python manage.py test tests
+(PostgreSQL используется, если задана переменная POSTGRES_DB).
+'''
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import Subscribe, User
+
+AUTHORS = 5
+RECIPES_PER_AUTHOR = 6
+PAGE_SIZES = (1, 6, 30)
+
+# Бюджеты запросов (анонимно, авторизованно) для прогретых кешей:
+# количества записей в списках и индексы поиска уже посчитаны.
+# Авторизованный запрос дополнительно читает токен, а сериализаторы
+# пользователей -- набор подписок читателя.
+BUDGETS = {
+    'recipe-list': (3, 5),
+    'recipe-list-filtered': (4, 6),
+    'recipe-list-cursor': (3, 5),
+    'recipe-detail': (3, 5),
+    'user-list': (1, 3),
+    'user-detail': (1, 3),
+    'user-me': (None, 1),
+    'subscriptions': (None, 4),
+    'tag-list': (1, 2),
+    'tag-detail': (1, 2),
+    'ingredient-list': (1, 2),
+    'ingredient-autocomplete': (0, 1),
+    'ingredient-detail': (1, 2),
+    'download-shopping-cart': (None, 2),
+    'get-link': (0, 1),
+    'get-links': (0, 1),
+    'short-link': (0, 0),
+}
+
+
+class QueryBudgetTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', slug=f'tag{i}')
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(10)
+        ]
+        cls.reader = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Читатель', last_name='Читателев', password='pass',
+        )
+        cls.token = Token.objects.create(user=cls.reader)
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{i}@foodgram.ru', username=f'author{i}',
+                first_name='Автор', last_name=str(i), password='pass',
+            )
+            for i in range(AUTHORS)
+        ]
+        cls.recipes = []
+        for author in cls.authors:
+            for i in range(RECIPES_PER_AUTHOR):
+                recipe = Recipe.objects.create(
+                    author=author, name=f'Рецепт {author.pk}-{i}',
+                    text='Описание', cooking_time=10,
+                )
+                recipe.tags.set(cls.tags[:2])
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                     amount=i + 1)
+                    for ingredient in cls.ingredients[i:i + 3]
+                )
+                cls.recipes.append(recipe)
+        Subscribe.objects.bulk_create(
+            Subscribe(subscriber=cls.reader, author=author)
+            for author in cls.authors[:-1]
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.reader, recipe=recipe)
+            for recipe in cls.recipes[::2]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.reader, recipe=recipe)
+            for recipe in cls.recipes[::3]
+        )
+        ShoppingListItem.objects.refresh([cls.reader])
+
+    def setUp(self):
+        self.anon = APIClient()
+        self.auth = APIClient()
+        self.auth.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def count_queries(self, client, url, status_code=200):
+        client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status_code, url)
+        return len(context.captured_queries)
+
+    def assertQueryBudget(self, client, url, budget, status_code=200):
+        queries = self.count_queries(client, url, status_code)
+        self.assertLessEqual(
+            queries, budget,
+            f'{url}: {queries} запросов при бюджете {budget}',
+        )
+
+    def assertPageQueryBudget(self, client, url, budget):
+        '''Проверяет бюджет и его независимость от размера страницы.'''
+        separator = '&' if '?' in url else '?'
+        counts = {
+            size: self.count_queries(
+                client, f'{url}{separator}limit={size}'
+            )
+            for size in PAGE_SIZES
+        }
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f'{url}: число запросов зависит от размера страницы {counts}',
+        )
+        self.assertLessEqual(
+            counts[PAGE_SIZES[0]], budget,
+            f'{url}: {counts} запросов при бюджете {budget}',
+        )
+
+    def assertBudgets(self, url, name, paginated=False, **kwargs):
+        '''Проверяет бюджет для анонима и авторизованного читателя.'''
+        check = (self.assertPageQueryBudget if paginated
+                 else self.assertQueryBudget)
+        for user, client, budget in zip(
+            ('anonymous', 'reader'), (self.anon, self.auth), BUDGETS[name]
+        ):
+            if budget is None:
+                continue
+            with self.subTest(url=url, user=user):
+                check(client, url, budget, **kwargs)
+
+    def test_recipe_list(self):
+        self.assertBudgets('/api/recipes/', 'recipe-list', paginated=True)
+
+    def test_recipe_list_cursor(self):
+        self.assertBudgets(
+            '/api/recipes/?cursor=', 'recipe-list-cursor', paginated=True
+        )
+
+    def test_recipe_list_filtered(self):
+        for url in (
+            '/api/recipes/?tags=tag0&tags=tag1',
+            f'/api/recipes/?author={self.authors[0].pk}',
+        ):
+            self.assertBudgets(url, 'recipe-list-filtered', paginated=True)
+
+    def test_recipe_list_user_filters(self):
+        for url in (
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+        ):
+            self.assertBudgets(url, 'recipe-list', paginated=True)
+
+    def test_recipe_detail(self):
+        self.assertBudgets(
+            f'/api/recipes/{self.recipes[0].pk}/', 'recipe-detail'
+        )
+
+    def test_user_list(self):
+        self.assertBudgets('/api/users/', 'user-list', paginated=True)
+
+    def test_user_detail(self):
+        self.assertBudgets(f'/api/users/{self.authors[0].pk}/', 'user-detail')
+
+    def test_user_me(self):
+        self.assertBudgets('/api/users/me/', 'user-me')
+
+    def test_subscriptions(self):
+        for recipes_limit in (1, 3, RECIPES_PER_AUTHOR):
+            self.assertBudgets(
+                f'/api/users/subscriptions/?recipes_limit={recipes_limit}',
+                'subscriptions', paginated=True,
+            )
+
+    def test_tags(self):
+        self.assertBudgets('/api/tags/', 'tag-list')
+        self.assertBudgets(f'/api/tags/{self.tags[0].pk}/', 'tag-detail')
+
+    def test_ingredients(self):
+        self.assertBudgets('/api/ingredients/', 'ingredient-list')
+        self.assertBudgets(
+            '/api/ingredients/?name=инг', 'ingredient-autocomplete'
+        )
+        self.assertBudgets(
+            f'/api/ingredients/{self.ingredients[0].pk}/',
+            'ingredient-detail',
+        )
+
+    def test_download_shopping_cart(self):
+        self.assertBudgets(
+            '/api/recipes/download_shopping_cart/', 'download-shopping-cart'
+        )
+
+    def test_get_link(self):
+        self.assertBudgets(
+            f'/api/recipes/{self.recipes[0].pk}/get-link/', 'get-link'
+        )
+
+    def test_get_links(self):
+        ids = ','.join(str(recipe.pk) for recipe in self.recipes)
+        self.assertBudgets(f'/api/recipes/get-links/?ids={ids}', 'get-links')
+
+    def test_short_link(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        self.assertBudgets(
+            f'/s/{recipe.get_short_code()}/', 'short-link',
+            status_code=302,
+        )
@@ -0,0 +1,174 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from recipes.models import Favorite, Recipe, RecipeRanking, ShoppingCart, Tag
+from recipes.rankings import refresh
+
+User = get_user_model()
+
+
+class RankingsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', password='pass',
+            first_name='Имя', last_name='Фамилия',
+        )
+        cls.readers = [
+            User.objects.create_user(
+                email=f'reader{i}@foodgram.ru', username=f'reader{i}',
+                password='pass', first_name='Имя', last_name='Фамилия',
+            )
+            for i in range(4)
+        ]
+        cls.breakfast = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.dinner = Tag.objects.create(name='Ужин', slug='dinner')
+        cls.old, cls.fresh, cls.quiet = (
+            Recipe.objects.create(
+                author=cls.author, name=name, text='Описание',
+                cooking_time=10,
+            )
+            for name in ('Старый хит', 'Новинка', 'Без активности')
+        )
+        cls.old.tags.add(cls.dinner)
+        cls.fresh.tags.add(cls.breakfast)
+        cls.quiet.tags.add(cls.breakfast)
+        # Старый рецепт собрал больше, но давно; новый -- сегодня.
+        long_ago = timezone.now() - timedelta(days=30)
+        for reader in cls.readers:
+            Favorite.objects.create(user=reader, recipe=cls.old)
+            ShoppingCart.objects.create(user=reader, recipe=cls.old)
+        Favorite.objects.filter(recipe=cls.old).update(created=long_ago)
+        ShoppingCart.objects.filter(recipe=cls.old).update(created=long_ago)
+        for reader in cls.readers[:2]:
+            Favorite.objects.create(user=reader, recipe=cls.fresh)
+
+    def names(self, **params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_refresh_fills_periods(self):
+        refresh()
+        self.assertEqual(
+            sorted(RecipeRanking.objects.values_list(
+                'period', 'recipe', 'score'
+            )),
+            sorted([
+                ('all', self.old.pk, 8),
+                ('all', self.fresh.pk, 2),
+                ('day', self.fresh.pk, 2),
+                ('week', self.fresh.pk, 2),
+            ]),
+        )
+
+    def test_refresh_writes_only_changes(self):
+        refresh()
+        self.assertEqual(refresh(), {'day': 0, 'week': 0, 'all': 0})
+        Favorite.objects.filter(recipe=self.fresh).first().delete()
+        ShoppingCart.objects.create(user=self.readers[0], recipe=self.quiet)
+        self.assertEqual(refresh(), {'day': 2, 'week': 2, 'all': 2})
+        self.assertEqual(
+            dict(RecipeRanking.objects.filter(
+                period='day'
+            ).values_list('recipe', 'score')),
+            {self.fresh.pk: 1, self.quiet.pk: 1},
+        )
+        self.assertFalse(RecipeRanking.objects.filter(stale=True))
+
+    def test_refresh_reads_only_new_activity(self):
+        refresh()
+        Favorite.objects.create(user=self.readers[3], recipe=self.quiet)
+        with CaptureQueriesContext(connection) as queries:
+            refresh(['all'])
+        self.assertFalse(any(
+            'FROM "recipes_recipe"' in query['sql']
+            and 'IN (' not in query['sql']
+            for query in queries
+        ))
+        self.assertEqual(
+            RecipeRanking.objects.get(period='all', recipe=self.quiet).score,
+            1,
+        )
+
+    def test_activity_leaves_window(self):
+        refresh()
+        tomorrow = timezone.now() + timedelta(days=1, minutes=1)
+        self.assertEqual(
+            refresh(['day', 'week'], now=tomorrow), {'day': 1, 'week': 0}
+        )
+        self.assertFalse(RecipeRanking.objects.filter(period='day'))
+
+    def test_ordering(self):
+        refresh()
+        # Рецепты без добавлений за период в рейтинг не попадают.
+        self.assertEqual(self.names(ordering='popular'),
+                         ['Старый хит', 'Новинка'])
+        self.assertEqual(self.names(ordering='trending'), ['Новинка'])
+        self.assertEqual(
+            self.names(ordering='trending', period='all'),
+            ['Старый хит', 'Новинка'],
+        )
+        self.assertEqual(
+            self.names(ordering='popular', tags='breakfast'), ['Новинка']
+        )
+        response = self.client.get('/api/recipes/', {'ordering': 'random'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor(self):
+        refresh()
+        response = self.client.get(
+            '/api/recipes/', {'ordering': 'popular', 'cursor': '', 'limit': 1}
+        )
+        names = []
+        while True:
+            names.extend(
+                recipe['name'] for recipe in response.data['results']
+            )
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(names, ['Старый хит', 'Новинка'])
+
+    def test_list_does_not_aggregate(self):
+        refresh()
+        with CaptureQueriesContext(connection) as queries:
+            self.names(ordering='trending')
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] and 'GROUP BY' in query['sql']
+            for query in queries
+        ))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('refresh_rankings', '--period', 'day', stdout=out)
+        self.assertIn('day: изменено строк 1', out.getvalue())
+        self.assertFalse(RecipeRanking.objects.exclude(period='day'))
+
+    def test_command_survives_database_errors(self):
+        err = StringIO()
+        with mock.patch(
+            'recipes.management.commands.refresh_rankings.refresh',
+            side_effect=[OperationalError('server closed the connection'),
+                         {'day': 0}],
+        ), mock.patch(
+            'recipes.management.commands.refresh_rankings.time.sleep',
+            side_effect=[None, KeyboardInterrupt],
+        ), mock.patch(
+            'recipes.management.commands.refresh_rankings'
+            '.close_old_connections'
+        ) as close:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('refresh_rankings', '--every', '1',
+                             stdout=StringIO(), stderr=err)
+        self.assertIn('server closed the connection', err.getvalue())
+        self.assertEqual(close.call_count, 2)
@@ -0,0 +1,144 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+import api.constants as const
+from recipes.models import (ImportProgress, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
+from recipes.ndjson import RecipeImporter, export_recipes
+from recipes.short_links import encode_short_code
+
+User = get_user_model()
+
+
+class RecipeNdjsonTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+        cls.admin = User.objects.create_superuser(
+            email='admin@foodgram.ru', username='admin',
+            first_name='Админ', last_name='Админов', password='pass',
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Описание',
+                cooking_time=10 + i,
+            )
+            recipe.tags.add(cls.tag)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=cls.ingredient, amount=100 + i
+            )
+
+    def line(self, name, **extra):
+        data = {
+            'author': 'cook', 'name': name, 'text': 'Описание',
+            'cooking_time': 15, 'tags': ['breakfast'],
+            'ingredients': [
+                {'name': 'мука', 'measurement_unit': 'г', 'amount': 50}
+            ],
+        }
+        data.update(extra)
+        return json.dumps(data, ensure_ascii=False).encode() + b'\n'
+
+    def test_export_import_round_trip(self):
+        lines = list(export_recipes(batch_size=2))
+        self.assertEqual(len(lines), 3)
+        Recipe.objects.all().delete()
+        importer = RecipeImporter(batch_size=2).run(lines)
+        self.assertEqual(importer.created, 3)
+        self.assertEqual(importer.errors, [])
+        exported = [json.loads(line) for line in lines]
+        for data in exported:
+            data.pop('id')
+        imported = [json.loads(line) for line in export_recipes()]
+        for data in imported:
+            data.pop('id')
+        self.assertEqual(imported, exported)
+
+    def test_bad_lines_are_reported(self):
+        lines = [
+            self.line('Первый'),
+            b'{not json\n',
+            self.line('Без автора', author='nobody'),
+            self.line('Без тега', tags=['unknown']),
+            self.line('Н' * (const.RECIPE_CHAR_LEN + 1)),
+            self.line('Латиница').replace(b'cook', b'\xff'),
+            self.line('Последний'),
+        ]
+        importer = RecipeImporter(batch_size=2).run(lines)
+        self.assertEqual(importer.created, 2)
+        self.assertEqual(
+            sorted(error['line'] for error in importer.errors),
+            [2, 3, 4, 5, 6],
+        )
+        self.assertTrue(Recipe.objects.filter(name='Последний').exists())
+
+    def test_short_codes_written_once(self):
+        lines = [self.line(f'С кодом {i}') for i in range(3)]
+        with CaptureQueriesContext(connection) as queries:
+            RecipeImporter().run(lines)
+        self.assertEqual(len([
+            query for query in queries
+            if query['sql'].startswith('UPDATE "recipes_recipe"')
+            and '"short_code"' in query['sql']
+        ]), 1)
+        for recipe in Recipe.objects.filter(name__startswith='С кодом'):
+            self.assertEqual(recipe.short_code, encode_short_code(recipe.pk))
+
+    def test_resume_skips_loaded_lines(self):
+        lines = [self.line(f'Новый {i}') for i in range(5)]
+        RecipeImporter(batch_size=2, source='file').run(lines[:3])
+        self.assertEqual(
+            ImportProgress.objects.get(source='file').position, 3
+        )
+        importer = RecipeImporter(batch_size=2, source='file').run(
+            lines, resume=True
+        )
+        self.assertEqual(importer.skipped, 3)
+        self.assertEqual(importer.created, 2)
+        self.assertEqual(
+            Recipe.objects.filter(name__startswith='Новый').count(), 5
+        )
+
+    def test_endpoints_require_admin(self):
+        self.client.force_authenticate(self.author)
+        self.assertEqual(
+            self.client.get('/api/recipes/export/').status_code, 403
+        )
+        self.assertEqual(
+            self.client.post('/api/recipes/import/').status_code, 403
+        )
+
+    def test_export_and_import_endpoints(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/recipes/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(len(body.splitlines()), 3)
+        response = self.client.generic(
+            'POST', '/api/recipes/import/?source=upload',
+            self.line('Загруженный') + b'{broken\n',
+            content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['error_count'], 1)
+        self.assertEqual(
+            ImportProgress.objects.get(source='upload').position, 2
+        )
+        response = self.client.post(
+            '/api/recipes/import/', {'name': 'x'}, format='json'
+        )
+        self.assertEqual(response.status_code, 415)
@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeReadSerializer
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscribe
+
+User = get_user_model()
+
+
+class RecipeRepresentationTest(APITestCase):
+    '''Быстрый to_representation совпадает с ModelSerializer.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров', password='pass',
+            avatar='media/users/cook.png',
+        )
+        cls.reader = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Читатель', last_name='Читателев', password='pass',
+        )
+        Subscribe.objects.create(subscriber=cls.reader, author=cls.author)
+        tags = [
+            Tag.objects.create(name=f'Тег {i}', slug=f'tag{i}')
+            for i in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(3)
+        ]
+        for i in range(4):
+            recipe = Recipe.objects.create(
+                author=cls.author if i % 2 else cls.reader,
+                name=f'Рецепт "{i}"', text='Строка вторая\n\tтретья',
+                cooking_time=10 + i,
+                image=f'media/recipes/{i}.png' if i else '',
+            )
+            recipe.tags.set(tags[:i % 2 + 1])
+            for ingredient in ingredients[:i]:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=100 + i
+                )
+        Favorite.objects.create(user=cls.reader, recipe=recipe)
+        ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+
+    def reference(self, response, recipes):
+        '''Ответ обычного ModelSerializer.to_representation.'''
+        view = response.renderer_context['view']
+        serializer = RecipeReadSerializer(
+            recipes, many=True, context=view.get_serializer_context()
+        )
+        return [
+            serializers.ModelSerializer.to_representation(
+                serializer.child, recipe
+            )
+            for recipe in recipes
+        ]
+
+    def assert_list_matches(self):
+        response = self.client.get('/api/recipes/?limit=10')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        view = response.renderer_context['view']
+        recipes = {
+            recipe.pk: recipe for recipe in view.get_queryset()
+        }
+        expected = self.reference(
+            response, [recipes[item['id']] for item in results]
+        )
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(results), renderer.render(expected))
+        self.assertEqual(response.content, renderer.render(response.data))
+
+    def test_anonymous_list(self):
+        self.assert_list_matches()
+
+    def test_authenticated_list(self):
+        self.client.force_authenticate(self.reader)
+        self.assert_list_matches()
+
+    def test_detail(self):
+        self.client.force_authenticate(self.reader)
+        recipe = Favorite.objects.get(user=self.reader).recipe
+        response = self.client.get(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        view = response.renderer_context['view']
+        expected = self.reference(
+            response, [view.get_queryset().get(pk=recipe.pk)]
+        )[0]
+        self.assertTrue(expected['is_favorited'])
+        self.assertTrue(expected['author']['is_subscribed'])
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+
+class FastJSONRendererTest(SimpleTestCase):
+
+    def assert_same(self, data, media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type),
+        )
+
+    def test_same_bytes(self):
+        self.assert_same({
+            'text': 'Юникод "кавычки" \\ \x1f \u2028 \u2029 /',
+            'detail': ErrorDetail('Ошибка', code='invalid'),
+            'numbers': [0, -1, 2 ** 62, True, False, None],
+            'nested': [{'b': 1, 'a': [{}]}],
+        })
+        self.assert_same([])
+        self.assert_same(None)
+
+    def test_fallback(self):
+        self.assert_same({0: ['int key']})
+        self.assert_same({'detail': gettext_lazy('Not found.')})
+        self.assert_same({'a': [1, 2]}, 'application/json; indent=2')
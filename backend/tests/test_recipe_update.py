@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+class RecipeUpdateTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', slug=f'tag{i}')
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(4)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Блины', text='Описание',
+            cooking_time=20,
+        )
+        cls.recipe.tags.set(cls.tags[:2])
+        for ingredient, amount in zip(cls.ingredients[:3], (100, 200, 300)):
+            RecipeIngredient.objects.create(
+                recipe=cls.recipe, ingredient=ingredient, amount=amount
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def rows(self):
+        return {
+            item.ingredient_id: (item.pk, item.amount)
+            for item in RecipeIngredient.objects.filter(recipe=self.recipe)
+        }
+
+    def test_patch_without_tags_and_ingredients(self):
+        before = self.rows()
+        response = self.client.patch(
+            self.url, {'name': 'Оладьи'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['name'], 'Оладьи')
+        self.assertEqual(self.rows(), before)
+        self.assertEqual(
+            set(self.recipe.tags.values_list('pk', flat=True)),
+            {tag.pk for tag in self.tags[:2]},
+        )
+
+    def test_ingredients_diff(self):
+        first, second, third, fourth = self.ingredients
+        before = self.rows()
+        response = self.client.patch(self.url, {
+            'ingredients': [
+                {'id': first.pk, 'amount': 100},
+                {'id': second.pk, 'amount': 250},
+                {'id': fourth.pk, 'amount': 50},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        after = self.rows()
+        self.assertEqual(after[first.pk], before[first.pk])
+        self.assertEqual(after[second.pk], (before[second.pk][0], 250))
+        self.assertNotIn(third.pk, after)
+        self.assertEqual(after[fourth.pk][1], 50)
+
+    def test_unchanged_ingredients_write_nothing(self):
+        payload = {
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient, amount in zip(self.ingredients[:3],
+                                              (100, 200, 300))
+            ],
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        writes = [
+            query['sql'] for query in context.captured_queries
+            if 'recipes_recipeingredient' in query['sql']
+            and not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(writes, [])
+
+    def test_tags_replaced(self):
+        response = self.client.patch(
+            self.url, {'tags': [self.tags[2].pk]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            list(self.recipe.tags.values_list('pk', flat=True)),
+            [self.tags[2].pk],
+        )
+
+    def test_empty_lists_rejected(self):
+        for payload in ({'tags': []}, {'ingredients': []}):
+            with self.subTest(payload=payload):
+                response = self.client.patch(
+                    self.url, payload, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Tag
+
+User = get_user_model()
+
+
+class RecipeValidationQueriesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', slug=f'tag{i}')
+            for i in range(5)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(40)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+
+    def payload(self, ingredients, tags):
+        return {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'image': 'http://example.com/image.png',
+            'tags': [tag.pk for tag in tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 10}
+                for ingredient in ingredients
+            ],
+        }
+
+    def count_lookups(self, ingredients, tags):
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(
+                '/api/recipes/', self.payload(ingredients, tags),
+                format='json',
+            )
+        return sum(
+            query['sql'].startswith('SELECT')
+            and ('"recipes_ingredient"."id" IN' in query['sql']
+                 or '"recipes_tag"."id" IN' in query['sql']
+                 or '"recipes_ingredient"."id" =' in query['sql']
+                 or '"recipes_tag"."id" =' in query['sql'])
+            for query in context.captured_queries
+        )
+
+    def test_lookups_do_not_depend_on_size(self):
+        self.assertEqual(
+            self.count_lookups(self.ingredients[:2], self.tags[:1]),
+            self.count_lookups(self.ingredients, self.tags),
+        )
+
+    def test_per_item_errors(self):
+        payload = self.payload(self.ingredients[:3], self.tags[:2])
+        payload['ingredients'][1]['id'] = 999999
+        payload['ingredients'][2]['id'] = 'abc'
+        payload['tags'].append(888888)
+        response = self.client.post('/api/recipes/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors['ingredients'][0], {})
+        self.assertIn('999999', errors['ingredients'][1]['id'][0])
+        self.assertIn('id', errors['ingredients'][2])
+        self.assertEqual(list(errors['tags']), ['2'])
+        self.assertIn('888888', errors['tags']['2'][0])
@@ -0,0 +1,147 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem, Tag)
+
+User = get_user_model()
+
+
+class ShoppingListTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.flour = Ingredient.objects.create(name='мука',
+                                              measurement_unit='г')
+        cls.eggs = Ingredient.objects.create(name='яйца',
+                                             measurement_unit='шт')
+        cls.milk = Ingredient.objects.create(name='молоко',
+                                             measurement_unit='мл')
+        cls.recipes = []
+        for amounts in ((200, 2), (300, 1)):
+            recipe = Recipe.objects.create(
+                author=cls.user, name='Блины', text='Описание',
+                cooking_time=20,
+            )
+            recipe.tags.add(cls.tag)
+            for ingredient, amount in zip((cls.flour, cls.eggs), amounts):
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def shopping_list(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient__name', 'amount'))
+
+    def add(self, recipe):
+        response = self.client.post(
+            f'/api/recipes/{recipe.pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_refresh_locks_users(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.add(self.recipes[0])
+        self.assertTrue(any(
+            'FOR UPDATE' in query['sql'] for query in queries
+        ))
+
+    def test_add_and_remove(self):
+        self.add(self.recipes[0])
+        self.add(self.recipes[1])
+        self.assertEqual(self.shopping_list(), {'мука': 500, 'яйца': 3})
+        response = self.client.delete(
+            f'/api/recipes/{self.recipes[0].pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.shopping_list(), {'мука': 300, 'яйца': 1})
+
+    def test_recipe_update(self):
+        self.add(self.recipes[0])
+        self.add(self.recipes[1])
+        response = self.client.patch(
+            f'/api/recipes/{self.recipes[0].pk}/',
+            {
+                'tags': [self.tag.pk],
+                'ingredients': [{'id': self.milk.pk, 'amount': 250},
+                                {'id': self.flour.pk, 'amount': 100}],
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.shopping_list(), {'мука': 400, 'яйца': 1, 'молоко': 250}
+        )
+
+    def test_recipe_update_refreshes_once(self):
+        self.add(self.recipes[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(
+                f'/api/recipes/{self.recipes[0].pk}/',
+                {'ingredients': [{'id': self.flour.pk, 'amount': 100}]},
+                format='json',
+            )
+        refreshes = [
+            query for query in queries if query['sql'].startswith(
+                'DELETE FROM "recipes_shoppinglistitem"'
+            )
+        ]
+        self.assertEqual(len(refreshes), 1)
+        self.assertEqual(self.shopping_list(), {'мука': 100})
+
+    def test_admin_recipe_ingredient_changes(self):
+        admin = User.objects.create_superuser(
+            email='admin@foodgram.ru', username='admin', password='pass',
+            first_name='Имя', last_name='Фамилия',
+        )
+        self.client.force_login(admin)
+        self.add(self.recipes[0])
+        item = RecipeIngredient.objects.get(
+            recipe=self.recipes[0], ingredient=self.eggs
+        )
+        url = f'/admin/recipes/recipeingredient/{item.pk}/'
+        response = self.client.post(url + 'change/', {
+            'recipe': self.recipes[0].pk, 'ingredient': self.milk.pk,
+            'amount': 2,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shopping_list(), {'мука': 200, 'молоко': 2})
+        response = self.client.post(url + 'delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shopping_list(), {'мука': 200})
+
+    def test_recipe_delete(self):
+        self.add(self.recipes[0])
+        self.add(self.recipes[1])
+        Recipe.objects.get(pk=self.recipes[1].pk).delete()
+        self.assertEqual(self.shopping_list(), {'мука': 200, 'яйца': 2})
+
+    def test_command_verifies_and_rebuilds(self):
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=self.user, recipe=recipe)
+            for recipe in self.recipes
+        )
+        with self.assertRaises(CommandError):
+            call_command('rebuild_shopping_lists', verify=True,
+                         stdout=StringIO())
+        call_command('rebuild_shopping_lists', stdout=StringIO())
+        self.assertEqual(self.shopping_list(), {'мука': 500, 'яйца': 3})
+        call_command('rebuild_shopping_lists', verify=True,
+                     stdout=StringIO())
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+
+User = get_user_model()
+
+
+class ShoppingListExportTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+        flour = Ingredient.objects.create(name='мука', measurement_unit='г')
+        eggs = Ingredient.objects.create(name='яйца', measurement_unit='шт')
+        for amounts in ((200, 2), (300, 1)):
+            recipe = Recipe.objects.create(
+                author=cls.user, name='Блины', text='Описание',
+                cooking_time=20,
+            )
+            for ingredient, amount in zip((flour, eggs), amounts):
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def download(self, **params):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', params
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_text_is_default(self):
+        response, content = self.download()
+        self.assertEqual(
+            content, 'Список покупок:\nмука - 500 г.\nяйца - 3 шт.'
+        )
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; charset=utf-8'
+        )
+        self.assertIn('shopping_cart.txt', response['Content-Disposition'])
+
+    def test_csv(self):
+        response, content = self.download(format='csv')
+        self.assertEqual(
+            list(csv.reader(io.StringIO(content))),
+            [['Ингредиент', 'Количество', 'Единица измерения'],
+             ['мука', '500', 'г'], ['яйца', '3', 'шт']],
+        )
+        self.assertIn('shopping_cart.csv', response['Content-Disposition'])
+
+    def test_json(self):
+        response, content = self.download(format='json')
+        self.assertEqual(json.loads(content), [
+            {'name': 'мука', 'measurement_unit': 'г', 'amount': 500},
+            {'name': 'яйца', 'measurement_unit': 'шт', 'amount': 3},
+        ])
+        self.assertEqual(
+            response['Content-Type'], 'application/json; charset=utf-8'
+        )
+
+    def test_unknown_format(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'docx'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 401)
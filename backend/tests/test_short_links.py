@@ -0,0 +1,188 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+import api.constants as const
+from recipes.models import Recipe
+from recipes.short_links import (CODE_SPACE, ShortLinkResolver,
+                                 decode_short_code, encode_short_code,
+                                 short_links)
+
+User = get_user_model()
+
+
+class ShortLinkTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Автор', last_name='Авторов', password='pass',
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Описание',
+                cooking_time=10,
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        short_links.local.clear()
+
+    def test_redirect_is_cached(self):
+        recipe = self.recipes[0]
+        url = f'/s/{recipe.get_short_code()}/'
+        response = self.client.get(url)
+        self.assertRedirects(
+            response, f'http://testserver/recipes/{recipe.pk}/',
+            fetch_redirect_response=False,
+        )
+        short_links.local.clear()
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_unknown_code_is_cached(self):
+        self.assertEqual(self.client.get('/s/unknown/').status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.client.get('/s/unknown/').status_code, 404
+            )
+
+    def test_new_recipe_clears_missing_code(self):
+        self.assertEqual(self.client.get('/s/fresh1/').status_code, 404)
+        recipe = Recipe.objects.create(
+            author=self.author, name='Новый', text='Описание',
+            cooking_time=10, short_code='fresh1',
+        )
+        response = self.client.get('/s/fresh1/')
+        self.assertRedirects(
+            response, f'http://testserver/recipes/{recipe.pk}/',
+            fetch_redirect_response=False,
+        )
+
+    def test_delete_invalidates(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        url = f'/s/{recipe.get_short_code()}/'
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.get(f'/api/recipes/{recipe.pk}/get-link/')
+        recipe.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(
+            self.client.get(f'/api/recipes/{recipe.pk}/get-link/').status_code,
+            404,
+        )
+
+    def test_delete_invalidates_other_workers(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        code = recipe.get_short_code()
+        # Отдельный резолвер -- память другого воркера.
+        worker = ShortLinkResolver()
+        self.assertEqual(worker.resolve(code), recipe.pk)
+        self.assertEqual(worker.codes([recipe.pk]), {recipe.pk: code})
+        recipe.delete()
+        self.assertIsNone(worker.resolve(code))
+        self.assertEqual(worker.codes([recipe.pk]), {})
+
+    def test_get_links(self):
+        first, second, _ = self.recipes
+        response = self.client.get(
+            f'/api/recipes/get-links/?ids={second.pk},{first.pk},0'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            f'/api/recipes/get-links/?ids={second.pk},{first.pk}'
+            f'&ids=999999&ids={second.pk}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'id': recipe.pk,
+             'short-link': f'http://testserver/s/{recipe.get_short_code()}'}
+            for recipe in (second, first)
+        ])
+
+    def test_get_links_requires_ids(self):
+        response = self.client.get('/api/recipes/get-links/')
+        self.assertEqual(response.status_code, 400)
+
+
+class ShortCodeTest(APITestCase):
+
+    def test_round_trip(self):
+        pks = [1, 2, 3, 61, 62, 10 ** 6, CODE_SPACE - 1]
+        codes = [encode_short_code(pk) for pk in pks]
+        self.assertEqual(len(set(codes)), len(codes))
+        for pk, code in zip(pks, codes):
+            self.assertEqual(len(code), const.SHORT_CODE_LEN)
+            self.assertEqual(decode_short_code(code), pk)
+
+    def test_codes_are_not_sequential(self):
+        self.assertNotEqual(
+            encode_short_code(2)[:-1], encode_short_code(1)[:-1]
+        )
+
+    def test_foreign_codes(self):
+        for code in ('', 'abc', 'abcdef', 'abc-def', 'abcdefgh'):
+            self.assertIsNone(decode_short_code(code))
+
+    def test_key_changes_codes(self):
+        codes = set()
+        for key in ('first', 'second'):
+            with override_settings(SHORT_CODE_KEY=key):
+                codes.add(encode_short_code(1))
+        self.assertEqual(len(codes), 2)
+
+    def test_save_does_not_probe(self):
+        author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Автор', last_name='Авторов', password='pass',
+        )
+        with CaptureQueriesContext(connection) as context:
+            recipe = Recipe.objects.create(
+                author=author, name='Рецепт', text='Описание',
+                cooking_time=10,
+            )
+        self.assertFalse(any(
+            'short_code' in query['sql'] and 'SELECT' in query['sql']
+            for query in context.captured_queries
+        ))
+        recipe.refresh_from_db()
+        code = encode_short_code(recipe.pk)
+        self.assertEqual(recipe.short_code, code)
+        self.assertEqual(short_links.resolve(code), recipe.pk)
+        # Выданная ссылка переживает смену ключа.
+        with override_settings(SHORT_CODE_KEY='rotated'):
+            cache.clear()
+            short_links.local.clear()
+            self.assertEqual(recipe.get_short_code(), code)
+            self.assertEqual(short_links.resolve(code), recipe.pk)
+
+    def test_backfill(self):
+        author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Автор', last_name='Авторов', password='pass',
+        )
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {i}', text='Описание',
+                   cooking_time=10)
+            for i in range(5)
+        )
+        Recipe.objects.create(
+            author=author, name='Старый', text='Описание', cooking_time=10,
+            short_code='legacy',
+        )
+        call_command('backfill_short_codes', batch_size=2, stdout=StringIO())
+        for recipe in Recipe.objects.all():
+            if recipe.name == 'Старый':
+                self.assertEqual(recipe.short_code, 'legacy')
+            else:
+                self.assertEqual(
+                    recipe.short_code, encode_short_code(recipe.pk)
+                )
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+
+from recipes.models import Favorite, Ingredient, Recipe, Tag
+from recipes.rankings import refresh
+from recipes.search import trigrams
+
+User = get_user_model()
+
+
+class TrigramSearchTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Автор', last_name='Авторов', password='pass',
+        )
+        soup = Tag.objects.create(name='Суп', slug='soup')
+        salad = Tag.objects.create(name='Салат', slug='salad')
+        for name, tag in (('Борщ украинский', soup),
+                          ('Борщ холодный', salad),
+                          ('Щи', soup),
+                          ('Оливье', salad)):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text='Описание', cooking_time=30
+            )
+            recipe.tags.add(tag)
+        for name in ('картофель', 'капуста белокочанная', 'морковь'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def recipe_names(self, query):
+        response = self.client.get('/api/recipes/', {'name': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_trigrams_follow_pg_trgm(self):
+        self.assertEqual(
+            trigrams('Щи!'), {'  щ', ' щи', 'щи '}
+        )
+
+    def test_recipe_name_with_typo(self):
+        self.assertEqual(
+            self.recipe_names('борш украинск'), ['Борщ украинский']
+        )
+        self.assertEqual(self.recipe_names('олевье'), ['Оливье'])
+
+    def test_recipe_search_respects_tags(self):
+        response = self.client.get(
+            '/api/recipes/', {'name': 'борщ', 'tags': 'salad'}
+        )
+        self.assertEqual(
+            [recipe['name'] for recipe in response.json()['results']],
+            ['Борщ холодный'],
+        )
+
+    def test_filters_apply_before_best_matches(self):
+        with mock.patch('recipes.search.TRIGRAM_SEARCH_LIMIT', 1):
+            for recipe in Recipe.objects.filter(name__startswith='Борщ'):
+                Favorite.objects.all().delete()
+                Favorite.objects.create(user=self.author, recipe=recipe)
+                refresh()
+                response = self.client.get(
+                    '/api/recipes/', {'name': 'борщ', 'ordering': 'popular'}
+                )
+                self.assertEqual(
+                    [item['name'] for item in response.json()['results']],
+                    [recipe.name],
+                )
+
+    def test_ingredient_typo_falls_back_to_trigrams(self):
+        response = self.client.get('/api/ingredients/', {'name': 'кортофель'})
+        self.assertEqual(
+            [item['name'] for item in response.json()], ['картофель']
+        )
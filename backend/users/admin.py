@@ -1,10 +1,11 @@
 from django.contrib import admin
 
+from core.admin import IndexedSearchMixin
 from .import models
 
 
 @admin.register(models.User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = (
         'username',
         'pk',
@@ -12,11 +13,27 @@ class UserAdmin(admin.ModelAdmin):
         'password',
         'first_name',
         'last_name',
+        'recipes_count',
+        'followers_count',
     )
     list_editable = ('password',)
-    list_filter = ('username', 'email')
+    list_filter = ('is_staff', 'is_active')
     search_fields = ('username', 'email')
+    search_prefix_fields = ('username', 'email')
     empty_value_display = '-пусто-'
 
 
-admin.site.register(models.Subscribe)
+@admin.register(models.Subscribe)
+class SubscribeAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ('subscriber', 'author')
+    list_select_related = ('subscriber', 'author')
+    autocomplete_fields = ('subscriber', 'author')
+    search_fields = ('subscriber__username', 'author__username')
+    search_id_fields = ('subscriber_id', 'author_id')
+    search_prefix_fields = (
+        'subscriber__username',
+        'subscriber__email',
+        'author__username',
+        'author__email',
+    )
+    empty_value_display = '-пусто-'
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants_for',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Копии созданы для аватара'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Индексы для поиска в админке по началу значения без учёта регистра:
+# istartswith в PostgreSQL -- UPPER(поле::text) LIKE UPPER('...%').
+UPPER_INDEXES = (
+    ('users_user_username_upper_like', 'users_user', 'username'),
+    ('users_user_email_upper_like', 'users_user', 'email'),
+)
+
+
+def create_upper_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index, table, column in UPPER_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index} ON {table} '
+            f'(UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_upper_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index, _, _ in UPPER_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_user_avatar_variants_for'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_upper_indexes, drop_upper_indexes),
+    ]
@@ -3,9 +3,10 @@ from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 
 import api.constants as const
+from core.counted import CountedMixin, CountedQuerySet, CounterFieldsMixin
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
 
     username_validator = UnicodeUsernameValidator()
 
@@ -43,9 +44,26 @@ class User(AbstractUser):
         blank=True,
         null=True,
     )
+    avatar_variants_for = models.CharField(
+        verbose_name='Копии созданы для аватара',
+        max_length=100,
+        blank=True,
+        editable=False,
+    )
+
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов', default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков', default=0, editable=False
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Подписок', default=0, editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
+    counter_fields = ('recipes_count', 'followers_count', 'following_count')
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -56,7 +74,7 @@ class User(AbstractUser):
         return self.username
 
 
-class Subscribe(models.Model):
+class Subscribe(CountedMixin, models.Model):
     '''Модель подписок.'''
 
     subscriber = models.ForeignKey(
@@ -72,6 +90,8 @@ class Subscribe(models.Model):
         help_text='Автор',
     )
 
+    objects = CountedQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'